@@ -0,0 +1,9 @@
+import pytest
+
+from yatube.test_runner import test_settings
+
+
+@pytest.fixture(autouse=True, scope='session')
+def yatube_test_settings():
+    with test_settings():
+        yield
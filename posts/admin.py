@@ -1,18 +1,48 @@
 from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.shortcuts import render
 
-from .models import Group, Post
+from .models import Comment, Group, Post
+from .profiling import CATEGORIES, slow_requests
+from .search import matching
 
 
 class PostAdmin(admin.ModelAdmin):
-    list_display = ("pk", "group", "text", "pub_date", "author")
+    list_display = (
+        "pk", "group", "text", "pub_date", "author", "comment_count")
     search_fields = ("text",)
     list_filter = ("pub_date",)
     empty_value_display = "-пусто-"
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return matching(queryset, search_term), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('title',)}
 
 
+class CommentAdmin(admin.ModelAdmin):
+    list_display = ("pk", "post", "author", "text", "created")
+    raw_id_fields = ("post", "author")
+    list_select_related = ("post", "author")
+    list_filter = ("created",)
+
+
+admin.site.register(Comment, CommentAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Post, PostAdmin)
+
+
+@staff_member_required
+def slow_requests_view(request):
+    """Кольцевой буфер медленных запросов процесса, отдавшего страницу."""
+    context = dict(
+        admin.site.each_context(request),
+        title='Медленные запросы',
+        categories=CATEGORIES,
+        requests=slow_requests(),
+    )
+    return render(request, 'admin/slow_requests.html', context)
@@ -0,0 +1,205 @@
+"""
+JSON API только для чтения: ленты, публикации и комментарии.
+
+Ответы строятся из тех же наборов запросов, что и HTML-страницы
+(for_feed, timeline_page, постраничный вывод по курсору), и отдаются
+компактным JSON без пробелов. Параметр ?fields=id,text выбирает поля
+записей, ?limit= — размер страницы, ?cursor= — страницу. Каждый ответ
+несёт ETag и на совпавший If-None-Match получает 304.
+"""
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
+
+from yatube.settings import API_MAX_LIMIT, PER_PAGE
+
+from .etags import not_modified, page_etag, with_etag
+from .models import Group, Post, User
+from .paginators import get_page
+from .stats import stats_for
+from .thumbnails import image_variants
+from .timeline import prolific_newest, timeline_page
+
+POST_FIELDS = {
+    'id': lambda post: post.pk,
+    'text': lambda post: post.text,
+    'pub_date': lambda post: post.pub_date,
+    'author': lambda post: post.author.username,
+    'group': lambda post: post.group.slug if post.group else None,
+    'image': lambda post: post.image.url if post.image else None,
+    'image_variants': (
+        lambda post: image_variants(post.image) if post.image else None),
+    'comment_count': lambda post: post.comment_count,
+}
+# image_variants обращается к хранилищу миниатюр, поэтому только по запросу
+DEFAULT_POST_FIELDS = (
+    'id', 'text', 'pub_date', 'author', 'group', 'image', 'comment_count',
+)
+COMMENT_FIELDS = {
+    'id': lambda comment: comment.pk,
+    'text': lambda comment: comment.text,
+    'created': lambda comment: comment.created,
+    'author': lambda comment: comment.author.username,
+}
+DEFAULT_COMMENT_FIELDS = tuple(COMMENT_FIELDS)
+
+
+class BadRequest(Exception):
+    pass
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={
+        'ensure_ascii': False, 'separators': (',', ':'),
+    })
+
+
+def error(message, status):
+    return json_response({'error': message}, status)
+
+
+def requested_fields(request, available, default):
+    fields = request.GET.get('fields')
+    if not fields:
+        return default
+    fields = tuple(field.strip() for field in fields.split(',') if field)
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise BadRequest(f'Неизвестные поля: {", ".join(unknown)}')
+    return fields
+
+
+def page_size(request):
+    try:
+        limit = int(request.GET.get('limit', PER_PAGE))
+    except ValueError:
+        raise BadRequest('limit должен быть числом')
+    return min(max(limit, 1), API_MAX_LIMIT)
+
+
+def serialize(item, available, fields):
+    return {field: available[field](item) for field in fields}
+
+
+def serialize_page(page, available, fields):
+    return {
+        'results': [serialize(item, available, fields) for item in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+
+
+def api_view(view):
+    """Только GET; ошибки параметров запроса возвращаются как 400 в JSON."""
+    @require_GET
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as exc:
+            return error(str(exc), 400)
+    return wrapper
+
+
+def conditional(request, *parts):
+    """ETag ответа и готовый 304, если клиент уже получил эти данные."""
+    etag = page_etag(request, *parts)
+    return etag, not_modified(request, etag)
+
+
+def post_feed(request, posts):
+    fields = requested_fields(request, POST_FIELDS, DEFAULT_POST_FIELDS)
+    limit = page_size(request)
+    etag, cached = conditional(request)
+    if cached:
+        return cached
+    page = get_page(request, posts, limit)
+    return with_etag(json_response(
+        serialize_page(page, POST_FIELDS, fields)), etag)
+
+
+@api_view
+def posts(request):
+    return post_feed(request, Post.objects.for_feed())
+
+
+@api_view
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return post_feed(request, Post.objects.for_feed().filter(group=group))
+
+
+@api_view
+def user_posts(request, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return post_feed(request, Post.objects.for_feed().filter(author=author))
+
+
+@api_view
+def user_detail(request, username):
+    author = get_object_or_404(
+        User.objects.only('username', 'first_name', 'last_name'),
+        username=username)
+    stats = stats_for(author.pk)
+    etag, cached = conditional(
+        request, author.get_full_name(), stats.followers, stats.following,
+        stats.posts)
+    if cached:
+        return cached
+    return with_etag(json_response({
+        'username': author.username,
+        'full_name': author.get_full_name(),
+        'followers': stats.followers,
+        'following': stats.following,
+        'posts': stats.posts,
+    }), etag)
+
+
+@api_view
+def follow_posts(request):
+    if not request.user.is_authenticated:
+        return error('Требуется вход', 401)
+    fields = requested_fields(request, POST_FIELDS, DEFAULT_POST_FIELDS)
+    limit = page_size(request)
+    # Подписка и отписка меняют ленту без смены поколения лент;
+    # публикации популярных авторов в таблицу лент не попадают.
+    timeline = request.user.timeline.aggregate(
+        total=Count('pk'), last=Max('pk'))
+    etag, cached = conditional(
+        request, timeline['total'], timeline['last'],
+        prolific_newest(request.user))
+    if cached:
+        return cached
+    page = timeline_page(request, request.user, limit)
+    return with_etag(json_response(
+        serialize_page(page, POST_FIELDS, fields)), etag)
+
+
+@api_view
+def post_detail(request, post_id):
+    fields = requested_fields(request, POST_FIELDS, DEFAULT_POST_FIELDS)
+    etag, cached = conditional(request)
+    if cached:
+        return cached
+    post = get_object_or_404(Post.objects.for_feed(), pk=post_id)
+    return with_etag(
+        json_response(serialize(post, POST_FIELDS, fields)), etag)
+
+
+@api_view
+def post_comments(request, post_id):
+    fields = requested_fields(
+        request, COMMENT_FIELDS, DEFAULT_COMMENT_FIELDS)
+    limit = page_size(request)
+    etag, cached = conditional(request)
+    if cached:
+        return cached
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments = post.comments.select_related('author').only(
+        'id', 'text', 'created', 'post_id', 'author__id', 'author__username')
+    page = get_page(request, comments, limit, date_field='created')
+    return with_etag(json_response(
+        serialize_page(page, COMMENT_FIELDS, fields)), etag)
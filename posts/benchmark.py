@@ -0,0 +1,188 @@
+"""
+Сквозные замеры представлений.
+
+Каждый адрес из posts.urls, about.urls и users.urls запрашивается
+тестовым клиентом Django со всеми middleware. Для каждого адреса
+считаются p50 и p95 времени ответа, число SQL-запросов и размер ответа.
+Адреса с параметрами заполняются данными из базы: самым популярным
+автором, его последней публикацией и самой большой группой.
+
+Отдельный микробенчмарк сравнивает рендер ленты через include
+на каждую карточку с тегом {% post_items %} на страницах разного размера.
+"""
+import math
+import time
+
+from django.db import connection
+from django.db.models import Count
+from django.template import Context, Engine, engines
+from django.template.loader import render_to_string
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from about import urls as about_urls
+from users import urls as users_urls
+
+from . import urls as posts_urls
+from .models import Group, Post, User
+from .stats import stats_for
+
+# GET этих адресов меняет данные.
+SKIPPED = {'profile_follow', 'profile_unfollow'}
+URL_MODULES = (
+    (posts_urls, ''),
+    (about_urls, f'{about_urls.app_name}:'),
+    (users_urls, ''),
+)
+
+
+def percentile(values, percent):
+    """Значение по методу ближайшего ранга."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+def sample_arguments():
+    author = User.objects.annotate(
+        total=Count('following')).order_by('-total', 'pk').first()
+    post = (
+        Post.objects.filter(author=author).order_by('-pub_date').first()
+        if author else None
+    )
+    group = Group.objects.annotate(
+        total=Count('posts')).order_by('-total', 'pk').first()
+    return {
+        'username': author.username if author else '',
+        'post_id': post.pk if post else 0,
+        'slug': group.slug if group else '',
+    }
+
+
+def benchmark_urls(modules=URL_MODULES):
+    """Пары (имя, адрес) для всех представлений без изменения данных."""
+    arguments = sample_arguments()
+    for module, namespace in modules:
+        for pattern in module.urlpatterns:
+            if pattern.name in SKIPPED:
+                continue
+            kwargs = {
+                name: arguments[name]
+                for name in pattern.pattern.converters
+            }
+            name = f'{namespace}{pattern.name}'
+            yield name, reverse(name, kwargs=kwargs)
+
+
+def reader():
+    """Пользователь с наибольшим числом подписок."""
+    return User.objects.annotate(
+        total=Count('follower')).order_by('-total', 'pk').first()
+
+
+def measure(client, url, repeat):
+    try:
+        client.get(url)
+    except Exception as error:
+        # Представление падает без наших замеров — сообщаем и идём дальше.
+        return {'url': url, 'error': repr(error)}
+    timings = []
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'url': url,
+        'status': response.status_code,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'queries': len(queries) / repeat,
+        'bytes': len(response.content),
+    }
+
+
+def run(repeat, anonymous=False):
+    client = Client()
+    user = None if anonymous else reader()
+    if user:
+        client.force_login(user)
+    results = {
+        name: measure(client, url, repeat)
+        for name, url in benchmark_urls()
+    }
+    return {
+        'repeat': repeat,
+        'user': user.username if user else None,
+        'dataset': {
+            'users': User.objects.count(),
+            'posts': Post.objects.count(),
+            'user_following': stats_for(user.pk).following if user else 0,
+        },
+        'results': results,
+    }
+
+
+INCLUDE_FEED = (
+    '{% for post in page %}'
+    '{% include "includes/post_item.html" with post=post %}'
+    '{% endfor %}'
+)
+COMPILED_FEED = '{% load feed %}{% post_items page %}'
+
+
+def sample_page(size):
+    """Страница публикаций в памяти с готовыми фрагментами, как из кэша."""
+    author = User(pk=1, username='author')
+    group = Group(pk=1, slug='group', title='Группа')
+    now = timezone.now()
+    posts = [
+        Post(pk=number, author=author, group=group, pub_date=now,
+             text=f'Публикация {number}\nвторая строка',
+             comment_count=number % 3)
+        for number in range(1, size + 1)
+    ]
+    for post in posts:
+        post.fragment = mark_safe(render_to_string(
+            'includes/post_fragment.html', {'post': post}))
+    return posts, author
+
+
+def production_engine():
+    """Движок шаблонов проекта с кэширующим загрузчиком, как без DEBUG."""
+    engine = engines['django'].engine
+    return Engine(
+        dirs=engine.dirs, app_dirs=engine.app_dirs,
+        libraries=engine.libraries, autoescape=engine.autoescape)
+
+
+def feed_render(sizes, repeat):
+    """Медианы рендера ленты двумя способами и совпадение их HTML."""
+    engine = production_engine()
+    templates = {
+        'include': engine.from_string(INCLUDE_FEED),
+        'compiled': engine.from_string(COMPILED_FEED),
+    }
+    results = []
+    for size in sizes:
+        page, user = sample_page(size)
+        html = {}
+        timings = {}
+        for name, template in templates.items():
+            durations = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                html[name] = template.render(
+                    Context({'page': page, 'user': user}))
+                durations.append((time.perf_counter() - start) * 1000)
+            timings[name] = percentile(durations, 50)
+        results.append({
+            'size': size,
+            'include_ms': round(timings['include'], 3),
+            'compiled_ms': round(timings['compiled'], 3),
+            'speedup': round(timings['include'] / timings['compiled'], 2),
+            'identical': html['include'] == html['compiled'],
+        })
+    return results
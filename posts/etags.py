@@ -0,0 +1,41 @@
+"""
+Условные GET-запросы для страниц лент и публикаций.
+
+ETag страницы строится до рендеринга из номера поколения лент
+(feed_cache), читателя, адреса с параметрами и того, что страница
+показывает помимо публикаций (например, счётчиков профиля). Поколение
+меняется при любом изменении публикаций, комментариев и групп, поэтому
+совпавший ETag означает, что страница не изменилась, и клиент получает
+304 без запросов ленты и рендеринга шаблонов.
+"""
+import hashlib
+
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, quote_etag)
+
+from .feed_cache import feed_generation
+
+
+def page_etag(request, *parts):
+    version = '|'.join(map(str, (
+        feed_generation(), request.user.pk, request.get_full_path(), *parts,
+    )))
+    return quote_etag(hashlib.md5(version.encode()).hexdigest())
+
+
+def not_modified(request, etag):
+    """Ответ 304, если у клиента актуальная версия страницы."""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+    return response
+
+
+def with_etag(response, etag):
+    if response.status_code == 200:
+        response['ETag'] = etag
+        # Клиент и прокси хранят страницу, но перепроверяют её каждый раз.
+        patch_cache_control(response, no_cache=True)
+    return response
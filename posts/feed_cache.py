@@ -0,0 +1,29 @@
+"""
+Версия кэша лент.
+
+Ключи фрагментов ленты включают номер поколения. Любое изменение
+публикаций, комментариев или групп увеличивает номер, и старые фрагменты
+перестают читаться, не дожидаясь истечения таймаута.
+"""
+import time
+
+from django.core.cache import cache
+
+FEED_GENERATION_KEY = 'feed_generation'
+
+
+def feed_generation():
+    generation = cache.get(FEED_GENERATION_KEY)
+    if generation is None:
+        # Новое поколение не должно совпасть с вытесненным из кэша.
+        generation = time.time_ns()
+        cache.add(FEED_GENERATION_KEY, generation, None)
+        generation = cache.get(FEED_GENERATION_KEY, generation)
+    return generation
+
+
+def bump_feed_generation():
+    try:
+        cache.incr(FEED_GENERATION_KEY)
+    except ValueError:
+        cache.set(FEED_GENERATION_KEY, time.time_ns(), None)
@@ -0,0 +1,22 @@
+"""
+Отпечатки SQL-запросов.
+
+Литералы и параметры %s заменяются на ?, списки значений IN — на (...),
+пробелы схлопываются, поэтому запросы, отличающиеся только
+параметрами, получают один отпечаток.
+"""
+import re
+
+PLACEHOLDER = re.compile(r'%s')
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+SPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    sql = PLACEHOLDER.sub('?', sql)
+    sql = STRING.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    sql = IN_LIST.sub('(...)', sql)
+    return SPACE.sub(' ', sql).strip()
@@ -1,6 +1,8 @@
 from django import forms
+from django.conf import settings
 
 from .models import Comment, Post
+from .uploads import OversizedUpload
 
 
 class PostForm(forms.ModelForm):
@@ -12,6 +14,42 @@ class PostForm(forms.ModelForm):
             'group': 'Выберите группу',
             'image': 'Добавьте изображение'}
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.oversized = {
+            name for name, upload in self.files.items()
+            if isinstance(upload, OversizedUpload)
+        }
+        if self.oversized:
+            self.files = self.files.copy()
+            for name in self.oversized:
+                del self.files[name]
+
+    def clean_image(self):
+        """
+        Проверяет картинку по заголовку файла.
+
+        ImageField уже открыл файл через Pillow, не декодируя пикселей,
+        поэтому формат и размеры известны без загрузки картинки в память.
+        """
+        if 'image' in self.oversized:
+            raise forms.ValidationError(
+                'Файл больше %(limit)d МБ.',
+                params={'limit': settings.MAX_UPLOAD_SIZE // 2 ** 20})
+        image = self.cleaned_data['image']
+        header = getattr(image, 'image', None)
+        if header is None:
+            return image
+        if header.format not in settings.ALLOWED_IMAGE_FORMATS:
+            raise forms.ValidationError(
+                'Поддерживаются только JPEG, PNG, GIF и WebP.')
+        width, height = header.size
+        if width * height > settings.MAX_IMAGE_PIXELS:
+            raise forms.ValidationError(
+                'Изображение больше %(limit)d мегапикселей.',
+                params={'limit': settings.MAX_IMAGE_PIXELS // 10 ** 6})
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,60 @@
+"""
+Кэш HTML карточек публикаций.
+
+Часть карточки, одинаковая для всех читателей, рендерится из
+includes/post_fragment.html и кэшируется под ключом, который зависит
+от содержимого публикации: правка текста, смена картинки, группы или
+новый комментарий дают новый ключ. Кнопки читателя рендерятся
+в includes/post_item.html поверх готового фрагмента.
+
+Фрагмент с заглушкой вместо миниатюры живёт QUEUED_TIMEOUT секунд:
+если миниатюры так и не появились, следующий рендер снова ставит
+картинку в очередь.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from yatube.settings import POST_FRAGMENT_TIMEOUT
+
+from .thumbnails import PLACEHOLDER_PREFIX, QUEUED_TIMEOUT
+
+
+def fragment_key(post):
+    group = post.group
+    version = '|'.join(map(str, (
+        post.text,
+        post.image.name if post.image else '',
+        post.comment_count,
+        post.author.username,
+        group.slug if group else '',
+        group.title if group else '',
+    )))
+    digest = hashlib.md5(version.encode()).hexdigest()
+    return f'post_fragment:{post.pk}:{digest}'
+
+
+def attach_fragments(posts):
+    """Добавляет публикациям атрибут fragment с готовым HTML."""
+    keys = {fragment_key(post): post for post in posts}
+    cached = cache.get_many(keys)
+    missing = {}
+    for key, post in keys.items():
+        if key not in cached:
+            cached[key] = missing[key] = render_to_string(
+                'includes/post_fragment.html', {'post': post})
+        post.fragment = mark_safe(cached[key])
+    pending = {
+        key: html for key, html in missing.items()
+        if PLACEHOLDER_PREFIX in html
+    }
+    ready = {
+        key: html for key, html in missing.items() if key not in pending
+    }
+    if ready:
+        cache.set_many(ready, POST_FRAGMENT_TIMEOUT)
+    if pending:
+        cache.set_many(pending, QUEUED_TIMEOUT)
+    return posts
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts.benchmark import feed_render
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает рендер ленты через include на каждую карточку '
+        'и тегом post_items на страницах разного размера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[10, 50, 200])
+
+    def handle(self, *args, repeat, sizes, **options):
+        self.stdout.write(
+            f'{"карточек":>9} {"include, мс":>12} {"post_items, мс":>15} '
+            f'{"ускорение":>10} {"HTML":>6}')
+        for result in feed_render(sizes, repeat):
+            identical = 'тот же' if result['identical'] else 'другой'
+            line = (
+                f'{result["size"]:>9} {result["include_ms"]:>12} '
+                f'{result["compiled_ms"]:>15} {result["speedup"]:>10} '
+                f'{identical:>6}')
+            self.stdout.write(
+                line if result['identical'] else self.style.ERROR(line))
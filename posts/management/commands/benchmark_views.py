@@ -0,0 +1,40 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.benchmark import run
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет p50/p95 времени ответа, число запросов и размер '
+        'ответа для каждого адреса posts, about и users.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--anonymous', action='store_true',
+            help='Запрашивать страницы без входа на сайт.')
+        parser.add_argument(
+            '--output', help='Файл JSON для сравнения запусков.')
+
+    def handle(self, *args, repeat, anonymous, output, **options):
+        report = run(repeat, anonymous)
+        report['started'] = timezone.now().isoformat()
+        self.stdout.write(
+            f'{"адрес":<40} {"код":>4} {"p50, мс":>9} {"p95, мс":>9} '
+            f'{"запросы":>8} {"байты":>8}')
+        for name, result in report['results'].items():
+            if 'error' in result:
+                self.stdout.write(self.style.ERROR(
+                    f'{name:<40} {result["error"]}'))
+                continue
+            self.stdout.write(
+                f'{name:<40} {result["status"]:>4} {result["p50_ms"]:>9} '
+                f'{result["p95_ms"]:>9} {result["queries"]:>8} '
+                f'{result["bytes"]:>8}')
+        if output:
+            with open(output, 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
@@ -0,0 +1,95 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from posts.models import (Comment, Follow, Post, TimelineEntry, User,
+                          UserStats)
+from posts.search import fts_query, ranked_sql
+from posts.timeline import timeline_sources
+from yatube.settings import PER_PAGE
+
+FEED_ORDER = ('-pub_date', '-id')
+
+
+def hot_queries():
+    """
+    Запросы, которые выполняются на каждой странице ленты.
+
+    Значение — queryset или пара (SQL, параметры) для сырых запросов.
+    Ленты подписок и поиска берутся у тех же функций, что и в видах.
+    """
+    user = User.objects.order_by('pk').first() or User(pk=0)
+    prolific = UserStats.objects.order_by('-followers').values_list(
+        'user_id', flat=True).first() or 0
+    post = Post.objects.order_by('pk').first()
+    post_id = post.pk if post else 0
+    group_id = post.group_id if post and post.group_id else 0
+    after = Q(pub_date__lt=timezone.now()) | Q(
+        pub_date=timezone.now(), pk__lt=post_id)
+    feed = Post.objects.for_feed().order_by(*FEED_ORDER)
+    entries, author = timeline_sources(user, [prolific])
+    feed_order = ('-feed_date', '-id')
+    return {
+        'index': feed,
+        'index, следующая страница': feed.filter(after),
+        'group_posts': feed.filter(group_id=group_id),
+        'group_posts, следующая страница': feed.filter(
+            after, group_id=group_id),
+        'profile': feed.filter(author_id=user.pk),
+        'profile, следующая страница': feed.filter(after, author_id=user.pk),
+        'follow_index': TimelineEntry.objects.filter(
+            user_id=user.pk).order_by(*FEED_ORDER),
+        'follow_index, публикации': Post.objects.for_feed().filter(
+            pk__in=[post_id]),
+        'follow_index, лента с популярными авторами': entries.order_by(
+            *feed_order),
+        'follow_index, популярный автор': author.order_by(*feed_order),
+        'profile, подписка': Follow.objects.filter(
+            user_id=user.pk, author_id=prolific),
+        'search': ranked_sql(fts_query('публикация'), 0, PER_PAGE + 1),
+        'post, комментарии': Comment.objects.filter(
+            post_id=post_id).select_related('author'),
+        'api, комментарии': Comment.objects.filter(
+            post_id=post_id).select_related('author').order_by(
+            '-created', '-id'),
+    }
+
+
+def is_full_scan(detail):
+    detail = detail.upper()
+    # RIGHT PART: строки идут в порядке индекса, сортируются только
+    # записи с равной датой, и LIMIT по-прежнему обрывает проход.
+    if 'TEMP B-TREE' in detail and 'RIGHT PART' not in detail:
+        return True
+    return detail.startswith('SCAN') and 'INDEX' not in detail
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN QUERY PLAN для запросов лент и сообщает '
+        'о полных просмотрах таблиц и сортировках во временном B-дереве.'
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Проверка планов доступна только для SQLite.')
+        problems = 0
+        for name, query in hot_queries().items():
+            if isinstance(query, tuple):
+                sql, params = query
+            else:
+                sql, params = query[:PER_PAGE + 1].query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = [row[-1] for row in cursor.fetchall()]
+            self.stdout.write(name)
+            for detail in plan:
+                if is_full_scan(detail):
+                    problems += 1
+                    self.stdout.write(self.style.ERROR(f'  ! {detail}'))
+                else:
+                    self.stdout.write(f'    {detail}')
+        if problems:
+            raise CommandError(f'Найдено полных просмотров: {problems}')
+        self.stdout.write(self.style.SUCCESS('Полных просмотров нет.'))
@@ -0,0 +1,73 @@
+import os
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import delete
+from sorl.thumbnail.images import ImageFile
+
+from posts.models import Post
+from posts.storage import content_hash, name_digest
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки публикаций в раскладку по хэшу содержимого '
+        '(posts/ab/cd/<хэш>): одинаковые файлы сливаются в один, ссылки '
+        'в Post.image переписываются пачками, лишние файлы и их миниатюры '
+        'удаляются. Повторный запуск пропускает уже перенесённые картинки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет сделано.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Число имён файлов, читаемых из базы за один запрос.')
+
+    def handle(self, *args, dry_run, chunk_size, **options):
+        storage = Post._meta.get_field('image').storage
+        renamed = merged = missing = 0
+        last = ''
+        while True:
+            names = list(Post.objects.filter(image__gt=last).order_by(
+                'image').values_list('image', flat=True).distinct()[
+                :chunk_size])
+            if not names:
+                break
+            last = names[-1]
+            for name in names:
+                digest = name_digest(name)
+                if digest and storage.hashed_name(name, digest) == name:
+                    continue
+                if not storage.exists(name):
+                    missing += 1
+                    self.stderr.write(f'Нет файла {name}')
+                    continue
+                if digest is None:
+                    with storage.open(name) as content:
+                        digest = content_hash(content)
+                target = storage.hashed_name(name, digest)
+                duplicate = storage.exists(target)
+                self.stdout.write(
+                    f'{name} -> {target}'
+                    + (' (дубликат)' if duplicate else ''))
+                if dry_run:
+                    continue
+                # Сначала жёсткая ссылка, потом запись в базе и только
+                # затем удаление старого имени: прерванный запуск
+                # можно просто повторить.
+                if duplicate:
+                    merged += 1
+                else:
+                    os.makedirs(os.path.dirname(storage.path(target)),
+                                exist_ok=True)
+                    os.link(storage.path(name), storage.path(target))
+                    renamed += 1
+                Post.objects.filter(image=name).update(image=target)
+                # Миниатюры старого имени создавались и до смены хранилища.
+                delete(ImageFile(name, default_storage), delete_file=False)
+                delete(ImageFile(name, storage))
+        self.stdout.write(
+            f'Переименовано: {renamed}, слито дубликатов: {merged}, '
+            f'без файла: {missing}')
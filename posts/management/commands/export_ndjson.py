@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from posts.transfer import export_lines
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, группы, публикации, комментарии '
+        'и подписки в NDJSON. Файлы картинок не выгружаются, '
+        'только их имена.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output', nargs='?', default='-',
+            help='Файл для выгрузки; по умолчанию стандартный вывод.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Число строк, читаемых из базы за один запрос.')
+
+    def handle(self, *args, output, chunk_size, **options):
+        if output == '-':
+            for line in export_lines(chunk_size):
+                self.stdout.write(line, ending='')
+            return
+        written = 0
+        with open(output, 'w', encoding='utf-8') as file:
+            for line in export_lines(chunk_size):
+                file.write(line)
+                written += 1
+        self.stderr.write(f'Выгружено записей: {written}')
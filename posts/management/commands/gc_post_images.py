@@ -0,0 +1,82 @@
+import fcntl
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from sorl.thumbnail import delete
+from sorl.thumbnail.images import ImageFile
+
+from posts.models import Post
+from posts.storage import name_digest
+from yatube.runtime import private_directory
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки публикаций, на которые не ссылается ни одна '
+        'публикация, вместе с их миниатюрами. Файлы, сохранённые позже '
+        'чем IMAGE_GC_GRACE секунд назад, не трогаются: публикация с ними '
+        'может быть ещё не записана в базу. Запускается по расписанию; '
+        'два запуска одновременно не работают.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Число имён файлов, проверяемых в базе за один запрос.')
+
+    def handle(self, *args, dry_run, chunk_size, **options):
+        path = os.path.join(
+            private_directory(settings.RUNTIME_DIR), 'gc_post_images.lock')
+        with open(path, 'a') as lock:
+            try:
+                fcntl.lockf(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                raise CommandError('Команда уже запущена')
+            removed = self.collect(dry_run, chunk_size)
+        self.stdout.write(f'Удалено картинок: {removed}')
+
+    @staticmethod
+    def stale(path, deadline):
+        try:
+            return os.stat(path).st_mtime < deadline
+        except FileNotFoundError:
+            return False
+
+    def candidates(self, storage, deadline):
+        """Имена файлов по хэшу, не менявшихся дольше IMAGE_GC_GRACE."""
+        root = storage.path(Post._meta.get_field('image').upload_to)
+        for directory, _, files in os.walk(root):
+            for filename in files:
+                full_path = os.path.join(directory, filename)
+                name = os.path.relpath(full_path, storage.location).replace(
+                    os.sep, '/')
+                digest = name_digest(name)
+                if digest is None or storage.hashed_name(name, digest) != name:
+                    continue
+                if self.stale(full_path, deadline):
+                    yield name
+
+    def collect(self, dry_run, chunk_size):
+        storage = Post._meta.get_field('image').storage
+        deadline = time.time() - settings.IMAGE_GC_GRACE
+        names = list(self.candidates(storage, deadline))
+        removed = 0
+        for start in range(0, len(names), chunk_size):
+            chunk = names[start:start + chunk_size]
+            used = set(Post.objects.filter(image__in=chunk).values_list(
+                'image', flat=True))
+            for name in chunk:
+                # Файл мог быть сохранён заново, пока читалась база.
+                if name in used or not self.stale(storage.path(name),
+                                                  deadline):
+                    continue
+                self.stdout.write(name)
+                removed += 1
+                if not dry_run:
+                    delete(ImageFile(name, storage))
+        return removed
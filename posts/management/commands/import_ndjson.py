@@ -0,0 +1,274 @@
+import itertools
+import json
+import os
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max, Q
+
+from posts import search, timeline
+from posts.feed_cache import bump_feed_generation
+from posts.management.commands.rebuild_comment_counts import (
+    rebuild_comment_counts)
+from posts.models import Comment, Follow, Group, Post, User
+from posts.transfer import MODELS, OFFSET_MODELS, create_with_dates
+
+# Соответствие ключей пользователей и групп исходной и целевой базы.
+# Таблица временная: она живёт в соединении команды и не держит
+# в памяти по записи на каждого пользователя файла.
+KEYS_TABLE = 'import_ndjson_keys'
+# Число ключей в одном IN: предел параметров запроса SQLite.
+KEYS_CHUNK = 500
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает NDJSON, выгруженный export_ndjson. Записи пишутся '
+        'пачками в транзакциях; после прерывания команду можно запустить '
+        'повторно, она продолжит с последней записанной пачки. Каждая '
+        'пачка сверяется с базой: если ключ со сдвигом уже занят другой '
+        'записью, загрузка останавливается с ошибкой.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Файл NDJSON.')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Число записей в одной транзакции.')
+        parser.add_argument(
+            '--state',
+            help='Файл состояния загрузки; по умолчанию <input>.state.')
+
+    def handle(self, *args, input, batch_size, state, **options):
+        self.state_path = state or f'{input}.state'
+        self.state = self.load_state()
+        self.loaded = 0
+        self.create_keys()
+        try:
+            number = self.read(input, batch_size)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE IF EXISTS {KEYS_TABLE}')
+        self.rebuild()
+        self.stdout.write(
+            f'Прочитано строк: {number}, записано записей: {self.loaded}')
+
+    def read(self, input, batch_size):
+        done = self.state['line']
+        batch = []
+        number = 0
+        with open(input, encoding='utf-8') as file:
+            for number, line in enumerate(file, 1):
+                record = json.loads(line)
+                if record['model'] not in MODELS:
+                    raise CommandError(
+                        f'Строка {number}: неизвестная модель '
+                        f'{record["model"]}')
+                # Пользователи и группы читаются всегда: по ним
+                # строится соответствие ключей для остальных записей.
+                if record['model'] in OFFSET_MODELS and number <= done:
+                    continue
+                if batch and (record['model'] != batch[0]['model']
+                              or len(batch) >= batch_size):
+                    self.flush(batch, number - 1)
+                    batch = []
+                batch.append(record)
+        if batch:
+            self.flush(batch, number)
+        return number
+
+    def load_state(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding='utf-8') as file:
+                return json.load(file)
+        state = {
+            'line': 0,
+            'offsets': {
+                label: MODELS[label].objects.aggregate(
+                    last=Max('pk'))['last'] or 0
+                for label in OFFSET_MODELS
+            },
+        }
+        self.save_state(state)
+        return state
+
+    def save_state(self, state):
+        temporary = f'{self.state_path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(state, file)
+        os.replace(temporary, self.state_path)
+
+    def flush(self, batch, line):
+        with transaction.atomic():
+            getattr(self, f'load_{batch[0]["model"]}')(batch)
+        self.state['line'] = max(self.state['line'], line)
+        self.save_state(self.state)
+
+    def create_keys(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {KEYS_TABLE}')
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {KEYS_TABLE} ('
+                f'model varchar(16) NOT NULL, source integer NOT NULL, '
+                f'target integer NOT NULL, PRIMARY KEY (model, source))')
+
+    def save_keys(self, label, pairs):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {KEYS_TABLE} (model, source, target) '
+                f'VALUES (%s, %s, %s)',
+                [(label, source, target) for source, target in pairs])
+
+    def keys(self, label, sources):
+        """Ключи целевой базы для ключей исходной базы из пачки."""
+        sources = sorted(set(sources))
+        found = {}
+        with connection.cursor() as cursor:
+            for start in range(0, len(sources), KEYS_CHUNK):
+                chunk = sources[start:start + KEYS_CHUNK]
+                placeholders = ', '.join(['%s'] * len(chunk))
+                cursor.execute(
+                    f'SELECT source, target FROM {KEYS_TABLE} '
+                    f'WHERE model = %s AND source IN ({placeholders})',
+                    [label, *chunk])
+                found.update(cursor.fetchall())
+        return found
+
+    def new_pk(self, label, pk):
+        return pk + self.state['offsets'][label]
+
+    def check_loaded(self, model, expected, fields):
+        """
+        Сверяет пачку с базой после bulk_create(ignore_conflicts=True).
+
+        Строка с тем же ключом и теми же полями — эта же пачка, записанная
+        до прерывания. Ключ, занятый другой записью, значит, что после
+        расчёта сдвига в таблицу писали; такая пачка откатывается.
+        """
+        found = {
+            row[0]: row[1:]
+            for row in model.objects.filter(
+                pk__in=expected).values_list('pk', *fields)
+        }
+        clashes = sorted(
+            pk for pk, values in expected.items() if found.get(pk) != values)
+        if clashes:
+            raise CommandError(
+                f'{model._meta.label}: ключи {clashes[:10]} заняты другими '
+                f'записями; удалите {self.state_path} и загрузите заново')
+        self.loaded += len(expected)
+
+    def load_user(self, batch):
+        records = {record['fields']['username']: record for record in batch}
+        existing = set(User.objects.filter(
+            username__in=records).values_list('username', flat=True))
+        User.objects.bulk_create([
+            User(**record['fields'])
+            for username, record in records.items()
+            if username not in existing
+        ])
+        self.save_keys('user', (
+            (records[username]['pk'], pk)
+            for username, pk in User.objects.filter(
+                username__in=records).values_list('username', 'pk')))
+
+    def load_group(self, batch):
+        records = {record['fields']['slug']: record for record in batch}
+        existing = set(Group.objects.filter(
+            slug__in=records).values_list('slug', flat=True))
+        Group.objects.bulk_create([
+            Group(**record['fields'])
+            for slug, record in records.items()
+            if slug not in existing
+        ])
+        self.save_keys('group', (
+            (records[slug]['pk'], pk)
+            for slug, pk in Group.objects.filter(
+                slug__in=records).values_list('slug', 'pk')))
+
+    def load_post(self, batch):
+        users = self.keys(
+            'user', (record['fields']['author_id'] for record in batch))
+        groups = self.keys('group', (
+            record['fields']['group_id'] for record in batch
+            if record['fields']['group_id'] is not None))
+        posts = []
+        for record in batch:
+            fields = dict(record['fields'])
+            fields['author_id'] = users[fields['author_id']]
+            if fields['group_id'] is not None:
+                fields['group_id'] = groups[fields['group_id']]
+            posts.append(Post(pk=self.new_pk('post', record['pk']), **fields))
+        create_with_dates(Post, posts, ignore_conflicts=True)
+        self.check_loaded(Post, {
+            post.pk: (post.author_id, post.text) for post in posts
+        }, ('author_id', 'text'))
+        search.index_posts([post.pk for post in posts])
+
+    def load_comment(self, batch):
+        users = self.keys(
+            'user', (record['fields']['author_id'] for record in batch))
+        comments = [
+            Comment(
+                pk=self.new_pk('comment', record['pk']),
+                post_id=self.new_pk('post', record['fields']['post_id']),
+                author_id=users[record['fields']['author_id']],
+                text=record['fields']['text'],
+                created=record['fields']['created'],
+            )
+            for record in batch
+        ]
+        create_with_dates(Comment, comments, ignore_conflicts=True)
+        self.check_loaded(Comment, {
+            comment.pk: (comment.post_id, comment.author_id, comment.text)
+            for comment in comments
+        }, ('post_id', 'author_id', 'text'))
+
+    def load_follow(self, batch):
+        users = self.keys('user', itertools.chain.from_iterable(
+            (record['fields']['user_id'], record['fields']['author_id'])
+            for record in batch))
+        follows = [
+            Follow(
+                pk=self.new_pk('follow', record['pk']),
+                user_id=users[record['fields']['user_id']],
+                author_id=users[record['fields']['author_id']],
+            )
+            for record in batch
+        ]
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        # Подписка, которая уже была в базе под другим ключом, пропускается
+        # по уникальности пары, поэтому сверяются пары, а не ключи.
+        pairs = {(follow.user_id, follow.author_id) for follow in follows}
+        found = set(Follow.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs},
+            author_id__in={author_id for _, author_id in pairs},
+        ).values_list('user_id', 'author_id'))
+        if pairs - found:
+            raise CommandError(
+                f'posts.Follow: ключи заняты другими записями; удалите '
+                f'{self.state_path} и загрузите заново')
+        self.loaded += len(follows)
+
+    def rebuild(self):
+        """Пересчитывает данные, которые обычно ведут сигналы."""
+        start = self.state['offsets']['post'] + 1
+        stop = (Post.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        for chunk in range(start, stop, 1000):
+            with transaction.atomic():
+                rebuild_comment_counts(
+                    Post, Comment, chunk, min(chunk + 1000, stop))
+        call_command('rebuild_user_stats', stdout=self.stdout)
+        # Ленты строятся один раз в конце по данным базы, а не по пачкам
+        # этого запуска: так их получают и существующие подписчики
+        # загруженных авторов, и загрузка, продолженная после прерывания.
+        user_ids = Follow.objects.filter(
+            Q(pk__gt=self.state['offsets']['follow'])
+            | Q(author__posts__pk__gte=start),
+            user__isnull=False,
+        ).order_by().values_list('user_id', flat=True).distinct()
+        for user_id in user_ids.iterator():
+            with transaction.atomic():
+                timeline.rebuild(user_id)
+        bump_feed_generation()
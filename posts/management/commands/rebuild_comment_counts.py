@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import Comment, Post
+
+
+def rebuild_comment_counts(posts, comments, start, stop):
+    counts = comments.objects.filter(
+        post=OuterRef('pk')
+    ).order_by().values('post').annotate(total=Count('pk')).values('total')
+    return posts.objects.filter(pk__gte=start, pk__lt=stop).update(
+        comment_count=Coalesce(
+            Subquery(counts, output_field=IntegerField()), 0)
+    )
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает Post.comment_count по таблице комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Число публикаций, пересчитываемых в одной транзакции.')
+
+    def handle(self, *args, chunk_size, **options):
+        last_pk = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        updated = 0
+        for start in range(1, last_pk + 1, chunk_size):
+            with transaction.atomic():
+                updated += rebuild_comment_counts(
+                    Post, Comment, start, start + chunk_size)
+        self.stdout.write(f'Пересчитано публикаций: {updated}')
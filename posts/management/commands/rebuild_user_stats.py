@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from posts.models import User
+from posts.stats import recount
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает статистику подписчиков, подписок и записей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Число пользователей, пересчитываемых в одной транзакции.')
+
+    def handle(self, *args, chunk_size, **options):
+        last_pk = User.objects.aggregate(last=Max('pk'))['last'] or 0
+        rebuilt = 0
+        for start in range(1, last_pk + 1, chunk_size):
+            with transaction.atomic():
+                rebuilt += recount(User.objects.filter(
+                    pk__gte=start, pk__lt=start + chunk_size))
+        self.stdout.write(f'Пересчитано пользователей: {rebuilt}')
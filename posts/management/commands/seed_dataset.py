@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from posts.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу набором данных для нагрузочных измерений: '
+        'пользователи, группы, публикации с картинками, комментарии '
+        'и граф подписок со степенным распределением популярности.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument(
+            '--images', type=int, default=20,
+            help='Число разных картинок.')
+        parser.add_argument(
+            '--image-ratio', type=float, default=0.2,
+            help='Доля публикаций с картинкой.')
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель закона Ципфа для популярности авторов.')
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределяются даты публикаций.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Префикс имён пользователей, групп и картинок.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        Seeder(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+            images=options['images'],
+            image_ratio=options['image_ratio'],
+            alpha=options['alpha'],
+            days=options['days'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            batch_size=options['batch_size'],
+        ).run(self.stdout)
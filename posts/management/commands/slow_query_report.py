@@ -0,0 +1,61 @@
+import glob
+import gzip
+import json
+import os
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+def log_files(path):
+    """Журнал и копии logrotate path.1, path.2.gz, ..."""
+    names = [path] + sorted(glob.glob(f'{glob.escape(path)}.*'))
+    return [name for name in names if os.path.exists(name)]
+
+
+def open_log(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводка журнала медленных SQL-запросов: отпечатки с наибольшим '
+        'суммарным временем с поправкой на долю выборки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--log', default=settings.SLOW_QUERY_LOG)
+
+    def handle(self, *args, top, log, **options):
+        totals = defaultdict(lambda: {
+            'count': 0.0, 'total_ms': 0.0, 'max_ms': 0.0, 'views': Counter(),
+        })
+        for path in log_files(log):
+            with open_log(path) as lines:
+                for line in lines:
+                    record = json.loads(line)
+                    # Запись выборки представляет 1 / sample_rate запросов.
+                    weight = 1 / record['sample_rate']
+                    summary = totals[record['fingerprint']]
+                    summary['count'] += weight
+                    summary['total_ms'] += record['ms'] * weight
+                    summary['max_ms'] = max(summary['max_ms'], record['ms'])
+                    summary['views'][record['view']] += 1
+        ranked = sorted(
+            totals.items(), key=lambda item: item[1]['total_ms'],
+            reverse=True)[:top]
+        self.stdout.write(
+            f'{"всего, мс":>12} {"запросов":>9} {"среднее":>9} '
+            f'{"максимум":>9}  представления')
+        for sql, summary in ranked:
+            views = ', '.join(
+                view or '-' for view, _ in summary['views'].most_common(3))
+            self.stdout.write(
+                f'{summary["total_ms"]:>12.1f} {summary["count"]:>9.0f} '
+                f'{summary["total_ms"] / summary["count"]:>9.1f} '
+                f'{summary["max_ms"]:>9.1f}  {views}')
+            self.stdout.write(f'    {sql}')
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts import timeline
+from posts.models import TimelineEntry
+
+
+class Command(BaseCommand):
+    help = (
+        'Обрезает ленты подписок, которые длиннее TIMELINE_MAX_LENGTH '
+        'больше чем на TIMELINE_TRIM_SLACK записей; запускается по '
+        'расписанию.'
+    )
+
+    def handle(self, *args, **options):
+        limit = settings.TIMELINE_MAX_LENGTH + settings.TIMELINE_TRIM_SLACK
+        user_ids = TimelineEntry.objects.order_by().values(
+            'user_id').annotate(total=Count('id')).filter(
+            total__gt=limit).values_list('user_id', flat=True)
+        trimmed = 0
+        for user_id in user_ids.iterator():
+            with transaction.atomic():
+                timeline.trim(user_id)
+            trimmed += 1
+        self.stdout.write(f'Обрезано лент: {trimmed}')
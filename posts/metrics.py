@@ -0,0 +1,310 @@
+"""
+Метрики в текстовом формате Prometheus.
+
+MetricsMiddleware считает для каждого имени адреса (index, group_posts,
+profile, ...) запросы, ответы 5xx, гистограмму времени ответа с
+фиксированными корзинами, попадания и промахи кэша и SQL-запросы.
+Счётчики запроса копятся в памяти и в конце одним блоком
+прибавляются к общему файлу METRICS_FILE, отображённому в память
+всеми процессами сервера.
+
+Файл — таблица из METRICS_SLOTS ячеек: ключ фиксированной длины
+и значение double. Ячейка ключа ищется открытой адресацией от crc32
+ключа, поэтому все процессы находят её в одном месте без общего
+реестра. Записи сериализуются блокировкой fcntl.lockf на файл
+и threading.Lock внутри процесса. Адрес /metrics отдаёт сводку
+сотрудникам и запросам с заголовком Authorization: Bearer METRICS_TOKEN.
+
+Без METRICS_ENABLED middleware отключается через MiddlewareNotUsed,
+файл не создаётся, а /metrics отвечает 404.
+"""
+import fcntl
+import functools
+import hmac
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.module_loading import import_string
+
+from yatube.runtime import private_directory
+
+logger = logging.getLogger(__name__)
+
+KEY_SIZE = 248
+VALUE = struct.Struct('d')
+SLOT_SIZE = KEY_SIZE + VALUE.size
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Имя для запросов, не совпавших ни с одним адресом: иначе каждый
+# случайный путь получил бы свой набор ячеек.
+UNRESOLVED = 'unresolved'
+FAMILIES = (
+    ('yatube_http_requests_total', 'counter',
+     'Запросы по имени адреса.'),
+    ('yatube_http_request_errors_total', 'counter',
+     'Ответы с кодом 5xx по имени адреса.'),
+    ('yatube_http_request_duration_seconds', 'histogram',
+     'Время ответа по имени адреса.'),
+    ('yatube_cache_hits_total', 'counter',
+     'Попадания в кэш по имени адреса.'),
+    ('yatube_cache_misses_total', 'counter',
+     'Промахи кэша по имени адреса.'),
+    ('yatube_db_queries_total', 'counter',
+     'SQL-запросы по имени адреса.'),
+)
+HISTOGRAM_SUFFIXES = ('_bucket', '_sum', '_count')
+MISSING = object()
+
+_local = threading.local()
+_lock = threading.Lock()
+_installed = False
+_files = {}
+
+
+class MetricsFile:
+    def __init__(self, path, slots):
+        self.slots = slots
+        self.lock = threading.Lock()
+        self.offsets = {}
+        size = slots * SLOT_SIZE
+        private_directory(os.path.dirname(path))
+        self.file = open(path, 'a+b')
+        with self.locked():
+            if os.fstat(self.file.fileno()).st_size < size:
+                os.ftruncate(self.file.fileno(), size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+
+    @contextmanager
+    def locked(self, exclusive=True):
+        with self.lock:
+            fcntl.lockf(
+                self.file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self.file, fcntl.LOCK_UN)
+
+    def offset(self, key):
+        """Смещение ячейки ключа; новая ячейка занимается под блокировкой."""
+        if key in self.offsets:
+            return self.offsets[key]
+        encoded = key.encode()
+        if len(encoded) > KEY_SIZE:
+            return None
+        start = zlib.crc32(encoded) % self.slots
+        for step in range(self.slots):
+            offset = (start + step) % self.slots * SLOT_SIZE
+            stored = self.map[offset:offset + KEY_SIZE].rstrip(b'\0')
+            if not stored:
+                self.map[offset:offset + KEY_SIZE] = encoded.ljust(
+                    KEY_SIZE, b'\0')
+            elif stored != encoded:
+                continue
+            self.offsets[key] = offset
+            return offset
+        return None
+
+    def add(self, increments):
+        with self.locked():
+            for key, amount in increments.items():
+                offset = self.offset(key)
+                if offset is None:
+                    logger.warning('Нет места для метрики %s', key)
+                    continue
+                value, = VALUE.unpack_from(self.map, offset + KEY_SIZE)
+                VALUE.pack_into(self.map, offset + KEY_SIZE, value + amount)
+
+    def items(self):
+        found = []
+        with self.locked(exclusive=False):
+            for slot in range(self.slots):
+                offset = slot * SLOT_SIZE
+                key = self.map[offset:offset + KEY_SIZE].rstrip(b'\0')
+                if key:
+                    value, = VALUE.unpack_from(self.map, offset + KEY_SIZE)
+                    found.append((key.decode(), value))
+        return found
+
+
+def metrics_file():
+    path = settings.METRICS_FILE
+    with _lock:
+        if path not in _files:
+            _files[path] = MetricsFile(path, settings.METRICS_SLOTS)
+        return _files[path]
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.hits = 0
+        self.misses = 0
+        self.depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+def counted_get(method):
+    @functools.wraps(method)
+    def wrapper(cache, key, default=None, version=None):
+        metrics = getattr(_local, 'metrics', None)
+        if metrics is None or metrics.depth:
+            return method(cache, key, default, version)
+        metrics.depth += 1
+        try:
+            value = method(cache, key, MISSING, version)
+        finally:
+            metrics.depth -= 1
+        if value is MISSING:
+            metrics.misses += 1
+            return default
+        metrics.hits += 1
+        return value
+    return wrapper
+
+
+def counted_get_many(method):
+    @functools.wraps(method)
+    def wrapper(cache, keys, version=None):
+        metrics = getattr(_local, 'metrics', None)
+        if metrics is None or metrics.depth:
+            return method(cache, keys, version)
+        keys = list(keys)
+        metrics.depth += 1
+        try:
+            found = method(cache, keys, version)
+        finally:
+            metrics.depth -= 1
+        metrics.hits += len(found)
+        metrics.misses += len(keys) - len(found)
+        return found
+    return wrapper
+
+
+def install():
+    """Оборачивает чтение кэша; повторный вызов ничего не делает."""
+    global _installed
+    with _lock:
+        if _installed:
+            return
+        backends = {
+            import_string(options['BACKEND'])
+            for options in settings.CACHES.values()
+        }
+        for backend in backends:
+            backend.get = counted_get(backend.get)
+            backend.get_many = counted_get_many(backend.get_many)
+        _installed = True
+
+
+def sample(name, view, le=''):
+    return f'{name} {view} {le}'
+
+
+def increments(view, duration, error, metrics):
+    name = 'yatube_http_request_duration_seconds'
+    values = {
+        sample('yatube_http_requests_total', view): 1,
+        sample(f'{name}_sum', view): duration,
+        sample(f'{name}_count', view): 1,
+        sample(f'{name}_bucket', view, '+Inf'): 1,
+        sample('yatube_cache_hits_total', view): metrics.hits,
+        sample('yatube_cache_misses_total', view): metrics.misses,
+        sample('yatube_db_queries_total', view): metrics.queries,
+    }
+    if error:
+        values[sample('yatube_http_request_errors_total', view)] = 1
+    # Нулевые корзины тоже пишутся: серия _bucket обязана содержать
+    # все границы le до +Inf.
+    for bucket in BUCKETS:
+        values[sample(f'{name}_bucket', view, bucket)] = int(
+            duration <= bucket)
+    return values
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        install()
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        _local.metrics = metrics
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _local.metrics = None
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        view = match.view_name if match else UNRESOLVED
+        metrics_file().add(increments(
+            view, duration, response.status_code >= 500, metrics))
+        return response
+
+
+def exposition(items):
+    """Текстовый формат Prometheus 0.0.4; корзины идут по возрастанию."""
+    samples = {}
+    for key, value in items:
+        name, view, le = key.split(' ')
+        samples.setdefault(name, []).append((view, le, value))
+    lines = []
+    for family, kind, description in FAMILIES:
+        lines.append(f'# HELP {family} {description}')
+        lines.append(f'# TYPE {family} {kind}')
+        names = (
+            [family + suffix for suffix in HISTOGRAM_SUFFIXES]
+            if kind == 'histogram' else [family]
+        )
+        rows = sorted(
+            (view, names.index(name), float(le or 0), name, le, value)
+            for name in names
+            for view, le, value in samples.get(name, ())
+        )
+        for view, _, _, name, le, value in rows:
+            labels = f'view="{view}"'
+            if le:
+                labels += f',le="{le}"'
+            lines.append(f'{name}{{{labels}}} {value!r}')
+    return '\n'.join(lines) + '\n'
+
+
+def authorized(request):
+    token = settings.METRICS_TOKEN
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    # WSGI отдаёт заголовки строками latin-1; compare_digest принимает
+    # строки только из ASCII, поэтому сравниваются исходные байты.
+    try:
+        header = header.encode('latin-1')
+    except UnicodeEncodeError:
+        header = b''
+    if token and hmac.compare_digest(header, f'Bearer {token}'.encode()):
+        return True
+    return request.user.is_active and request.user.is_staff
+
+
+def metrics_view(request):
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    if not authorized(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        exposition(metrics_file().items()),
+        content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.6 on 2026-10-18 19:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0014_post_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(help_text='пользователь', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='пользователь')),
+                ('followers', models.PositiveIntegerField(default=0, help_text='подписчиков', verbose_name='подписчиков')),
+                ('following', models.PositiveIntegerField(default=0, help_text='подписок', verbose_name='подписок')),
+                ('posts', models.PositiveIntegerField(default=0, help_text='записей', verbose_name='записей')),
+            ],
+            options={
+                'verbose_name': 'статистика пользователя',
+                'verbose_name_plural': 'статистика пользователей',
+            },
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -26,6 +28,16 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Публикации с автором и группой для вывода в ленте."""
+        return self.select_related('author', 'group').only(
+            'id', 'text', 'pub_date', 'image', 'comment_count',
+            'author__id', 'author__username',
+            'group__id', 'group__title', 'group__slug',
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name="текст публикации",
@@ -41,12 +53,50 @@ class Post(models.Model):
         Group, verbose_name="группа",
         help_text="группа", on_delete=models.SET_NULL,
         related_name="posts", blank=True, null=True)
-    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    image = models.ImageField(
+        upload_to='posts/', storage=ContentAddressedStorage(),
+        blank=True, null=True, db_index=True)
+    comment_count = models.PositiveIntegerField(
+        verbose_name="число комментариев",
+        help_text="число комментариев",
+        default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'публикация'
         verbose_name_plural = 'публикации'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'), name='post_date_id_idx'),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_date_idx'),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_date_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        """
+        Сохранение существующей публикации не трогает comment_count.
+
+        Счётчик ведут сигналы комментариев через F(); полная запись строки
+        вернула бы значение, прочитанное до сохранения, и потеряла бы
+        комментарии, добавленные в это время. Явно названный в update_fields
+        счётчик записывается.
+        """
+        if (not self._state.adding and not args
+                and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'comment_count'
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return (
@@ -75,6 +125,11 @@ class Comment(models.Model):
         verbose_name = 'комментарий'
         verbose_name_plural = 'комментарии'
         ordering = ('-created',)
+        indexes = [
+            models.Index(
+                fields=('post', '-created', '-id'),
+                name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return (
@@ -95,8 +150,62 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'подписка'
         verbose_name_plural = 'подписки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'author'), name='unique_follow'),
+        ]
 
     def __str__(self):
         return (
             f'{self.user.username} subscribed to '
             f'{self.author.username}')
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User, verbose_name="читатель", help_text="читатель",
+        on_delete=models.CASCADE, related_name="timeline")
+    post = models.ForeignKey(
+        Post, verbose_name="публикация", help_text="публикация",
+        on_delete=models.CASCADE, related_name="timeline_entries")
+    pub_date = models.DateTimeField(
+        verbose_name="дата публикации",
+        help_text="дата публикации")
+
+    class Meta:
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'записи ленты'
+        ordering = ('-pub_date',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'post'), name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-id'),
+                name='timeline_user_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user.username} {self.post_id}'
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User, verbose_name="пользователь", help_text="пользователь",
+        on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    followers = models.PositiveIntegerField(
+        verbose_name="подписчиков", help_text="подписчиков", default=0)
+    following = models.PositiveIntegerField(
+        verbose_name="подписок", help_text="подписок", default=0)
+    posts = models.PositiveIntegerField(
+        verbose_name="записей", help_text="записей", default=0)
+
+    class Meta:
+        verbose_name = 'статистика пользователя'
+        verbose_name_plural = 'статистика пользователей'
+
+    def __str__(self):
+        return (
+            f'{self.user_id}: {self.followers} подписчиков, '
+            f'{self.following} подписок, {self.posts} записей')
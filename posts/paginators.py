@@ -0,0 +1,180 @@
+import base64
+import binascii
+import heapq
+
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+def encode_cursor(direction, item, date_field='pub_date'):
+    raw = f'{direction}|{getattr(item, date_field).isoformat()}|{item.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (направление, дата, id) или None для битого курсора."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, date, pk = raw.split('|')
+        date = parse_datetime(date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if direction not in (FORWARD, BACKWARD) or date is None:
+        return None
+    return direction, date, pk
+
+
+class CursorPaginator(Paginator):
+    """
+    Постраничный вывод по ключу (pub_date, id).
+
+    Страница выбирается условием по ключу последней показанной записи,
+    поэтому не нужны ни COUNT(*), ни OFFSET, и стоимость запроса
+    не зависит от глубины страницы. Поле даты можно заменить через
+    date_field, например на created для комментариев.
+    """
+
+    def __init__(self, object_list, per_page, date_field='pub_date'):
+        super().__init__(
+            object_list.order_by(f'-{date_field}', '-id'), per_page)
+        self.date_field = date_field
+        self.has_next = False
+        self.has_previous = False
+
+    @property
+    def num_pages(self):
+        return 1 + self.has_previous + self.has_next
+
+    def select(self, posts, cursor):
+        """До per_page + 1 записей posts за курсором в порядке прохода."""
+        if cursor is not None:
+            direction, date, pk = cursor
+            field = self.date_field
+            if direction == FORWARD:
+                posts = posts.filter(
+                    Q(**{f'{field}__lt': date}) | Q(**{field: date}, pk__lt=pk)
+                )
+            else:
+                posts = posts.filter(
+                    Q(**{f'{field}__gt': date}) | Q(**{field: date}, pk__gt=pk)
+                ).reverse()
+        return list(posts[:self.per_page + 1])
+
+    def window(self, cursor):
+        return self.select(self.object_list, cursor)
+
+    def get_page(self, token):
+        cursor = decode_cursor(token)
+        direction = FORWARD if cursor is None else cursor[0]
+        items = self.window(cursor)
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if direction == FORWARD:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+        else:
+            items.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        if not items:
+            self.has_next = self.has_previous = False
+        page = Page(items, 1 + self.has_previous, self)
+        page.next_cursor = (
+            encode_cursor(FORWARD, items[-1], self.date_field)
+            if self.has_next else None
+        )
+        page.previous_cursor = (
+            encode_cursor(BACKWARD, items[0], self.date_field)
+            if self.has_previous else None
+        )
+        return page
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """
+    Постраничный вывод по ключу из нескольких querysets.
+
+    Окно страницы выбирается из каждого источника своим запросом по его
+    индексу, и окна сливаются в памяти: ORDER BY по объединению
+    источников сортировал бы все их записи. Запись, которая есть
+    в нескольких источниках, выводится один раз.
+    """
+
+    def __init__(self, sources, per_page, date_field='pub_date'):
+        super().__init__(sources[0], per_page, date_field)
+        self.sources = [
+            source.order_by(f'-{date_field}', '-id') for source in sources
+        ]
+
+    def window(self, cursor):
+        field = self.date_field
+        merged = heapq.merge(
+            *(self.select(source, cursor) for source in self.sources),
+            key=lambda item: (getattr(item, field), item.pk),
+            reverse=cursor is None or cursor[0] == FORWARD,
+        )
+        items = []
+        seen = set()
+        for item in merged:
+            if item.pk in seen:
+                continue
+            seen.add(item.pk)
+            items.append(item)
+            if len(items) > self.per_page:
+                break
+        return items
+
+
+def get_page(request, posts, per_page, date_field='pub_date'):
+    """Страница ленты публикаций по курсору из ?cursor=."""
+    return CursorPaginator(posts, per_page, date_field).get_page(
+        request.GET.get('cursor')
+    )
+
+
+class RankedPaginator(Paginator):
+    """
+    Постраничный вывод результатов в порядке, заданном функцией выборки.
+
+    fetch(offset, limit) возвращает список записей; следующая страница
+    определяется по лишней записи, поэтому COUNT(*) не выполняется.
+    Номер страницы ограничен max_pages: глубокий OFFSET стоит как
+    чтение всех предыдущих страниц.
+    """
+
+    def __init__(self, fetch, per_page, max_pages):
+        super().__init__([], per_page)
+        self.fetch = fetch
+        self.max_pages = max_pages
+        self.has_next = False
+        self.number = 1
+
+    @property
+    def num_pages(self):
+        return self.number + self.has_next
+
+    def get_page(self, number):
+        """
+        Страница number; битый номер даёт первую страницу, слишком большой —
+        страницу max_pages. Пустая страница после первой — EmptyPage:
+        номер последней страницы без COUNT(*) неизвестен.
+        """
+        try:
+            self.number = min(max(int(number), 1), self.max_pages)
+        except (TypeError, ValueError):
+            self.number = 1
+        items = self.fetch(
+            (self.number - 1) * self.per_page, self.per_page + 1)
+        if not items and self.number > 1:
+            raise EmptyPage('Страница не содержит результатов')
+        self.has_next = (
+            len(items) > self.per_page and self.number < self.max_pages)
+        return Page(items[:self.per_page], self.number, self)
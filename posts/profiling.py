@@ -0,0 +1,182 @@
+"""
+Профилирование запросов по частям: SQL, шаблоны, кэш и миниатюры.
+
+ProfilingMiddleware включается вручную через settings.MIDDLEWARE. Только
+при создании middleware методы шаблонов, бэкендов кэша и sorl
+оборачиваются счётчиками времени, поэтому без middleware накладных
+расходов нет совсем, а вне профилируемого запроса обёртка сводится
+к одному чтению threading.local. Когда middleware убирают из MIDDLEWARE
+(override_settings в тестах), uninstall возвращает исходные методы.
+SQL измеряется штатным connection.execute_wrapper на время запроса.
+
+Время частей отдаётся заголовком Server-Timing. Время вложенных вызовов
+одной категории не удваивается, а разные категории могут пересекаться:
+поиск миниатюры включает время обращения к кэшу и базе. Запросы
+дольше PROFILING_SLOW_MS попадают в кольцевой буфер последних
+PROFILING_BUFFER_SIZE записей; буфер свой у каждого процесса
+и просматривается сотрудниками в админке.
+"""
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections
+from django.dispatch import receiver
+from django.template.base import Template
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from sorl.thumbnail.kvstores.base import KVStoreBase
+
+CATEGORIES = ('db', 'tpl', 'cache', 'thumb')
+CACHE_METHODS = (
+    'get', 'get_many', 'set', 'set_many', 'add', 'touch', 'incr', 'decr',
+    'has_key', 'delete', 'delete_many', 'get_or_set',
+)
+KVSTORE_METHODS = ('get', 'get_or_set', 'set', 'delete')
+MIDDLEWARE_PATH = 'posts.profiling.ProfilingMiddleware'
+MISSING = object()
+
+_local = threading.local()
+_lock = threading.Lock()
+_installed = False
+# (класс, имя, метод из __dict__ класса) для uninstall.
+_originals = []
+_slow_requests = deque(maxlen=settings.PROFILING_BUFFER_SIZE)
+
+
+class Profile:
+    def __init__(self):
+        self.durations = dict.fromkeys(CATEGORIES, 0.0)
+        self.depth = dict.fromkeys(CATEGORIES, 0)
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.durations['db'] += time.perf_counter() - start
+
+    def server_timing(self, total):
+        parts = [
+            f'{name};dur={self.durations[name] * 1000:.1f}'
+            for name in CATEGORIES
+        ]
+        parts[0] += f';desc="{self.queries} queries"'
+        parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+
+def timed(category, method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        profile = getattr(_local, 'profile', None)
+        if profile is None or profile.depth[category]:
+            return method(*args, **kwargs)
+        profile.depth[category] += 1
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            profile.durations[category] += time.perf_counter() - start
+            profile.depth[category] -= 1
+    return wrapper
+
+
+def wrap_methods(cls, category, names):
+    for name in names:
+        method = getattr(cls, name, None)
+        if method is not None:
+            _originals.append((cls, name, cls.__dict__.get(name, MISSING)))
+            setattr(cls, name, timed(category, method))
+
+
+def install():
+    """Оборачивает шаблоны, кэш и sorl; повторный вызов ничего не делает."""
+    global _installed
+    with _lock:
+        if _installed:
+            return
+        wrap_methods(Template, 'tpl', ('render',))
+        backends = {
+            import_string(options['BACKEND'])
+            for options in settings.CACHES.values()
+        }
+        for backend in backends:
+            wrap_methods(backend, 'cache', CACHE_METHODS)
+        wrap_methods(KVStoreBase, 'thumb', KVSTORE_METHODS)
+        wrap_methods(
+            import_string(settings.THUMBNAIL_BACKEND), 'thumb',
+            ('get_thumbnail',))
+        _installed = True
+
+
+def uninstall():
+    """Возвращает исходные методы; без install ничего не делает."""
+    global _installed
+    with _lock:
+        # Обратный порядок возвращает и метод, обёрнутый дважды.
+        while _originals:
+            cls, name, method = _originals.pop()
+            if method is MISSING:
+                delattr(cls, name)
+            else:
+                setattr(cls, name, method)
+        _installed = False
+
+
+@receiver(setting_changed)
+def uninstall_without_middleware(setting, value, **kwargs):
+    if setting == 'MIDDLEWARE' and MIDDLEWARE_PATH not in (value or ()):
+        uninstall()
+
+
+def slow_requests():
+    """Медленные запросы этого процесса, новые первыми."""
+    with _lock:
+        return list(reversed(_slow_requests))
+
+
+def remember(request, response, profile, total):
+    match = request.resolver_match
+    record = {
+        'time': timezone.now(),
+        'method': request.method,
+        'path': request.get_full_path(),
+        'view': match.view_name if match else '',
+        'status': response.status_code,
+        'total_ms': round(total * 1000, 1),
+        'queries': profile.queries,
+    }
+    for name in CATEGORIES:
+        record[f'{name}_ms'] = round(profile.durations[name] * 1000, 1)
+    with _lock:
+        _slow_requests.append(record)
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install()
+
+    def __call__(self, request):
+        profile = Profile()
+        _local.profile = profile
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            _local.profile = None
+        total = time.perf_counter() - start
+        response['Server-Timing'] = profile.server_timing(total)
+        if total * 1000 >= settings.PROFILING_SLOW_MS:
+            remember(request, response, profile, total)
+        return response
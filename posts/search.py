@@ -0,0 +1,98 @@
+"""
+Полнотекстовый поиск по публикациям.
+
+Для SQLite используется таблица FTS5 posts_post_fts, rowid которой
+совпадает с id публикации; она обновляется сигналами сохранения и
+удаления Post. На других СУБД поиск сводится к icontains.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+
+
+def fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def fts_query(text):
+    """Запрос FTS5, в котором каждое слово ищется буквально."""
+    return ' '.join(f'"{term}"' for term in re.findall(r'\w+', text))
+
+
+def index_post(post):
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text])
+
+
+def index_posts(post_ids):
+    """Индексирует пачку публикаций, записанных мимо сигналов."""
+    if not fts_enabled() or not post_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(post_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+            post_ids)
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) '
+            f'SELECT id, text FROM {Post._meta.db_table} '
+            f'WHERE id IN ({placeholders})',
+            post_ids)
+
+
+def unindex_post(post_id):
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def matching(queryset, text):
+    """Фильтрует queryset публикаций по словам запроса."""
+    query = fts_query(text)
+    if not query:
+        return queryset.none()
+    if not fts_enabled():
+        return queryset.filter(text__icontains=text)
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [query]))
+
+
+def ranked_sql(query, offset, limit):
+    """SQL и параметры выборки id по релевантности для запроса FTS5."""
+    return (
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+        f'ORDER BY rank LIMIT %s OFFSET %s',
+        [query, limit, offset],
+    )
+
+
+def ranked_ids(text, offset, limit):
+    """id публикаций в порядке релевантности."""
+    query = fts_query(text)
+    if not query:
+        return []
+    if not fts_enabled():
+        return list(
+            Post.objects.filter(text__icontains=text)
+            .values_list('pk', flat=True)[offset:offset + limit])
+    with connection.cursor() as cursor:
+        cursor.execute(*ranked_sql(query, offset, limit))
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_posts(text, offset, limit):
+    ids = ranked_ids(text, offset, limit)
+    posts = Post.objects.for_feed().in_bulk(ids)
+    return [posts[pk] for pk in ids if pk in posts]
@@ -0,0 +1,190 @@
+"""
+Набор данных для нагрузочных измерений.
+
+Записи создаются фабриками mixer без сохранения и пишутся пачками
+bulk_create. Популярность авторов подчиняется закону Ципфа: вес автора
+ранга r равен 1 / r ** alpha, поэтому немногие авторы собирают
+большинство подписчиков, как в настоящей социальной сети. Сигналы
+при bulk_create не срабатывают, поэтому лента подписок, поиск
+и счётчики строятся отдельными проходами в конце.
+"""
+import itertools
+import random
+from datetime import timedelta
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from mixer.backend.django import Mixer
+from PIL import Image
+
+from . import search, timeline
+from .feed_cache import bump_feed_generation
+from .models import Comment, Follow, Group, Post, User
+from .transfer import create_with_dates
+
+mixer = Mixer(commit=False)
+
+
+def user_factory(username):
+    return mixer.blend(User, username=username)
+
+
+def group_factory(slug):
+    return mixer.blend(Group, slug=slug)
+
+
+def post_factory(pk, author_id, group_id, pub_date, image):
+    return mixer.blend(
+        Post, id=pk, author=mixer.SKIP, group=mixer.SKIP,
+        author_id=author_id, group_id=group_id, pub_date=pub_date,
+        image=image, comment_count=0)
+
+
+def comment_factory(pk, post_id, author_id, created):
+    return mixer.blend(
+        Comment, id=pk, post=mixer.SKIP, author=mixer.SKIP, post_id=post_id,
+        author_id=author_id, created=created)
+
+
+def zipf_weights(count, alpha):
+    """Накопленные веса рангов 1..count для random.choices."""
+    return list(itertools.accumulate(
+        1 / rank ** alpha for rank in range(1, count + 1)))
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Seeder:
+    def __init__(self, users, groups, posts, comments, follows, images,
+                 image_ratio, alpha, days, seed, prefix, batch_size):
+        self.counts = {
+            'users': users, 'groups': groups, 'posts': posts,
+            'comments': comments, 'follows': follows, 'images': images,
+        }
+        self.image_ratio = image_ratio
+        self.alpha = alpha
+        self.days = days
+        self.random = random.Random(seed)
+        mixer.faker.seed_instance(seed)
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.now = timezone.now()
+
+    def random_date(self):
+        return self.now - timedelta(
+            seconds=self.random.uniform(0, self.days * 24 * 60 * 60))
+
+    def write(self, model, objects):
+        for batch in batched(objects, self.batch_size):
+            with transaction.atomic():
+                create_with_dates(model, batch, ignore_conflicts=True)
+
+    def new_pks(self, model, after):
+        return list(model.objects.filter(pk__gt=after).order_by(
+            'pk').values_list('pk', flat=True))
+
+    def last_pk(self, model):
+        return model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+    def seed_users(self):
+        after = self.last_pk(User)
+        self.write(User, (
+            user_factory(f'{self.prefix}{number}')
+            for number in range(self.counts['users'])))
+        # Ранг популярности совпадает с порядком создания.
+        self.user_ids = self.new_pks(User, after)
+        self.popularity = zipf_weights(len(self.user_ids), self.alpha)
+
+    def seed_groups(self):
+        after = self.last_pk(Group)
+        self.write(Group, (
+            group_factory(f'{self.prefix}-{number}')
+            for number in range(self.counts['groups'])))
+        self.group_ids = self.new_pks(Group, after)
+
+    def seed_images(self):
+        storage = Post._meta.get_field('image').storage
+        self.images = []
+        for number in range(self.counts['images']):
+            content = BytesIO()
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            Image.new('RGB', (1280, 720), color).save(content, 'JPEG')
+            self.images.append(storage.save(
+                f'posts/{self.prefix}{number}.jpg',
+                ContentFile(content.getvalue())))
+
+    def popular_author(self):
+        return self.random.choices(
+            self.user_ids, cum_weights=self.popularity)[0]
+
+    def seed_posts(self):
+        after = self.last_pk(Post)
+
+        def posts():
+            for pk in range(after + 1, after + 1 + self.counts['posts']):
+                image = ''
+                if self.images and self.random.random() < self.image_ratio:
+                    image = self.random.choice(self.images)
+                group_id = None
+                if self.group_ids and self.random.random() < 0.5:
+                    group_id = self.random.choice(self.group_ids)
+                yield post_factory(
+                    pk, self.popular_author(), group_id, self.random_date(),
+                    image)
+
+        self.write(Post, posts())
+        self.post_ids = self.new_pks(Post, after)
+        for batch in batched(self.post_ids, self.batch_size):
+            search.index_posts(batch)
+
+    def seed_comments(self):
+        if not self.post_ids:
+            return
+        after = self.last_pk(Comment)
+        self.write(Comment, (
+            comment_factory(
+                pk, self.random.choice(self.post_ids),
+                self.random.choice(self.user_ids), self.random_date())
+            for pk in range(after + 1, after + 1 + self.counts['comments'])))
+
+    def seed_follows(self):
+        pairs = set()
+        attempts = 0
+        limit = len(self.user_ids) * (len(self.user_ids) - 1)
+        target = min(self.counts['follows'], limit)
+        while len(pairs) < target and attempts < target * 10:
+            attempts += 1
+            user_id = self.random.choice(self.user_ids)
+            author_id = self.popular_author()
+            if user_id != author_id:
+                pairs.add((user_id, author_id))
+        self.write(Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in pairs))
+        # Статистика нужна рассылке: популярным авторам лента не строится.
+        call_command('rebuild_user_stats', stdout=self.stdout)
+        readers = sorted({user_id for user_id, _ in pairs})
+        for batch in batched(readers, self.batch_size):
+            with transaction.atomic():
+                for user_id in batch:
+                    timeline.rebuild(user_id)
+
+    def run(self, stdout):
+        self.stdout = stdout
+        for step in ('users', 'groups', 'images', 'posts', 'comments',
+                     'follows'):
+            getattr(self, f'seed_{step}')()
+            stdout.write(f'{step}: {self.counts[step]}')
+        call_command('rebuild_comment_counts', stdout=stdout)
+        bump_feed_generation()
@@ -0,0 +1,94 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import search, stats, timeline
+from .feed_cache import bump_feed_generation
+from .models import Comment, Follow, Group, Post, User
+
+# Поля пользователя, которые видны на страницах лент и в шапке.
+USER_DISPLAY_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+# Счётчики обновляются первыми: рассылка ленты читает число подписчиков.
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if created:
+        stats.bump(instance.author_id, posts=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    stats.bump(instance.author_id, posts=-1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, **kwargs):
+    if created:
+        stats.bump(instance.author_id, followers=1)
+        stats.bump(instance.user_id, following=1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    stats.bump(instance.author_id, followers=-1)
+    stats.bump(instance.user_id, following=-1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created and instance.user_id and instance.author_id:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    if instance.user_id and instance.author_id:
+        timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comment_count=F('comment_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id, comment_count__gt=0).update(
+        comment_count=F('comment_count') - 1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_feeds(sender, **kwargs):
+    bump_feed_generation()
+
+
+@receiver(post_save, sender=User)
+def invalidate_feeds_on_rename(sender, update_fields=None, **kwargs):
+    # Вход обновляет только last_login, ленты от этого не меняются.
+    if update_fields and not USER_DISPLAY_FIELDS & set(update_fields):
+        return
+    bump_feed_generation()
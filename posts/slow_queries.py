@@ -0,0 +1,96 @@
+"""
+Выборочный журнал медленных SQL-запросов.
+
+SlowQueryLogMiddleware на время запроса ставит обёртку
+connection.execute_wrapper на каждое подключение. Запросы дольше
+SLOW_QUERY_MS с вероятностью SLOW_QUERY_SAMPLE_RATE записываются
+в NDJSON-журнал SLOW_QUERY_LOG (переменная окружения
+YATUBE_SLOW_QUERY_LOG): отпечаток без литералов, время,
+представление и доля выборки. Отчёт по нему строит команда
+slow_query_report.
+
+В журнал пишут все процессы сервера, поэтому сам журнал не ротируется:
+RotatingFileHandler каждого процесса переименовывал бы файл сам, и записи
+терялись бы или попадали в уже ротированную копию. Файл открывается
+с O_APPEND, и строки разных процессов не перемешиваются, а ротацию делает
+внешний logrotate. WatchedFileHandler замечает, что файл переименован,
+и открывает новый, так что copytruncate не нужен:
+
+    /var/log/yatube/slow_queries.ndjson {
+        daily
+        rotate 5
+        compress
+        delaycompress
+        missingok
+        notifempty
+    }
+"""
+import json
+import logging
+import os
+import random
+import time
+from contextlib import ExitStack
+from logging.handlers import WatchedFileHandler
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from yatube.runtime import private_directory
+
+from .fingerprints import fingerprint
+
+
+def log_handler():
+    path = settings.SLOW_QUERY_LOG
+    # Журнал по умолчанию лежит в RUNTIME_DIR, который создаётся так же,
+    # как для кэша и метрик; каталог, заданный явно, готовит администратор.
+    if os.path.dirname(os.path.abspath(path)) == os.path.abspath(
+            settings.RUNTIME_DIR):
+        private_directory(settings.RUNTIME_DIR)
+    return WatchedFileHandler(path, encoding='utf-8', delay=True)
+
+
+class SlowQueryLog:
+    def __init__(self, request, handler):
+        self.request = request
+        self.handler = handler
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            if (duration >= settings.SLOW_QUERY_MS
+                    and random.random() < settings.SLOW_QUERY_SAMPLE_RATE):
+                self.write(sql, duration, context)
+
+    def write(self, sql, duration, context):
+        match = self.request.resolver_match
+        record = {
+            'time': timezone.now().isoformat(),
+            'view': match.view_name if match else '',
+            'alias': context['connection'].alias,
+            'fingerprint': fingerprint(sql),
+            'ms': round(duration, 3),
+            'sample_rate': settings.SLOW_QUERY_SAMPLE_RATE,
+        }
+        self.handler.handle(logging.makeLogRecord({
+            'msg': json.dumps(record, ensure_ascii=False),
+            'levelno': logging.INFO,
+        }))
+
+
+class SlowQueryLogMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.handler = log_handler()
+
+    def __call__(self, request):
+        wrapper = SlowQueryLog(request, self.handler)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(wrapper))
+            return self.get_response(request)
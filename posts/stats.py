@@ -0,0 +1,73 @@
+"""Счётчики подписчиков, подписок и записей пользователя."""
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Follow, Post, User, UserStats
+
+
+def _count(queryset, field):
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+        field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def totals(users):
+    """Строки (pk, подписчики, подписки, записи) для queryset."""
+    return users.annotate(
+        followers_total=_count(Follow.objects.all(), 'author'),
+        following_total=_count(Follow.objects.all(), 'user'),
+        posts_total=_count(Post.objects.all(), 'author'),
+    ).values_list('pk', 'followers_total', 'following_total', 'posts_total')
+
+
+def recount(users):
+    """Пересчитывает статистику для queryset пользователей."""
+    rows = totals(users)
+    stats = [
+        UserStats(
+            user_id=pk, followers=followers, following=following, posts=posts)
+        for pk, followers, following, posts in rows
+    ]
+    UserStats.objects.filter(user__in=users).delete()
+    UserStats.objects.bulk_create(stats)
+    return len(stats)
+
+
+def stats_for(user_id):
+    """
+    Статистика пользователя; при отсутствии строки она пересчитывается.
+
+    Строка создаётся через get_or_create, а не через recount: при
+    одновременных запросах второй получает строку первого, а не
+    IntegrityError от повторной вставки.
+    """
+    try:
+        return UserStats.objects.get(user_id=user_id)
+    except UserStats.DoesNotExist:
+        pass
+    row = totals(User.objects.filter(pk=user_id)).first()
+    if row is None:
+        raise UserStats.DoesNotExist
+    _, followers, following, posts = row
+    with transaction.atomic():
+        stats, _ = UserStats.objects.get_or_create(user_id=user_id, defaults={
+            'followers': followers, 'following': following, 'posts': posts,
+        })
+    return stats
+
+
+def bump(user_id, **deltas):
+    """
+    Изменяет счётчики пользователя на deltas.
+
+    Строка статистики создаётся при первом чтении в stats_for, поэтому
+    отсутствующая строка здесь не создаётся, а счётчик не уводится в минус.
+    """
+    stats = UserStats.objects.filter(user_id=user_id)
+    for field, delta in deltas.items():
+        if delta < 0:
+            stats = stats.filter(**{f'{field}__gte': -delta})
+    stats.update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
@@ -0,0 +1,73 @@
+"""
+Хранилище картинок публикаций с адресацией по содержимому.
+
+Имя файла — SHA-256 его содержимого, поэтому одинаковые картинки
+хранятся одним файлом и одним набором миниатюр sorl.
+
+Файлы без публикаций не удаляются при сохранении и удалении публикаций:
+новая публикация с той же картинкой может сохраняться в это же время
+и ещё не видна в базе. Их убирает команда gc_post_images под
+блокировкой и только спустя IMAGE_GC_GRACE секунд после последнего
+сохранения: save обновляет время изменения уже существующего файла
+и заново записывает файл, если его успели удалить.
+
+Файлы раскладываются по подкаталогам из первых символов хэша
+(posts/ab/cd/abcd….jpg), как sorl раскладывает миниатюры в cache/,
+чтобы в одном каталоге не копились миллионы файлов.
+"""
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def name_digest(name):
+    """Хэш из имени файла, если файл уже назван по содержимому."""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return stem if DIGEST_RE.match(stem) else None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def hashed_name(self, name, digest):
+        # Подкаталоги хэша строятся от каталога верхнего уровня (upload_to),
+        # поэтому повторный расчёт для уже разложенного файла даёт то же имя.
+        directory = os.path.dirname(name).split('/')[0]
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            directory, digest[:2], digest[2:4], f'{digest}{extension}')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            from django.core.files import File
+            content = File(content, name)
+        name = self.hashed_name(name, content_hash(content))
+        try:
+            # Свежее время изменения защищает файл от gc_post_images,
+            # пока публикация с ним не сохранена в базе.
+            os.utime(self.path(name))
+            return name
+        except FileNotFoundError:
+            pass
+        saved = self._save(name, content)
+        if saved != name:
+            # Тот же файл успели записать параллельно: копия не нужна.
+            self.delete(saved)
+        return name
@@ -0,0 +1,12 @@
+from django import template
+
+from posts.thumbnails import image_variants
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_image(image):
+    if not image:
+        return None
+    return image_variants(image)
@@ -0,0 +1,112 @@
+"""
+Бюджеты представлений: число SQL-запросов, время SQL и время шаблонов.
+
+Бюджеты хранятся в budgets.json рядом с тестами и меняются вместе
+с кодом. Для каждого адреса записан список отпечатков запросов, поэтому
+при превышении тест показывает, какие именно запросы добавились.
+Пересчитать файл после осознанного изменения:
+
+    YATUBE_UPDATE_BUDGETS=1 python manage.py test posts.tests.test_budgets
+
+Обязательный бюджет — число запросов: оно не зависит от машины.
+Время записывается с запасом TIME_SLACK и не меньше MIN_TIME_MS и по
+умолчанию только выводится отчётом, чтобы медленная машина CI не
+роняла тесты. Проверить время как бюджет:
+
+    YATUBE_ENFORCE_TIME_BUDGETS=1 python manage.py test posts
+"""
+import difflib
+import json
+import os
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.template.base import Template
+from django.test.utils import CaptureQueriesContext
+
+from posts.fingerprints import fingerprint
+
+BUDGETS_PATH = os.path.join(os.path.dirname(__file__), 'budgets.json')
+UPDATE_ENV = 'YATUBE_UPDATE_BUDGETS'
+TIME_ENV = 'YATUBE_ENFORCE_TIME_BUDGETS'
+TIME_SLACK = 5
+MIN_TIME_MS = 50
+
+
+def measure(client, url):
+    """Один запрос с холодным кешем: запросы, время SQL и шаблонов."""
+    render = {'ms': 0.0, 'depth': 0}
+    original = Template.render
+
+    def timed_render(template, context):
+        # Вложенные include считаются в составе внешнего шаблона.
+        if render['depth']:
+            return original(template, context)
+        render['depth'] += 1
+        start = time.perf_counter()
+        try:
+            return original(template, context)
+        finally:
+            render['ms'] += (time.perf_counter() - start) * 1000
+            render['depth'] -= 1
+
+    cache.clear()
+    with mock.patch.object(Template, 'render', timed_render), \
+            CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    return {
+        'status': response.status_code,
+        'sql': [fingerprint(query['sql']) for query in queries],
+        'sql_ms': sum(float(query['time']) for query in queries) * 1000,
+        'render_ms': render['ms'],
+    }
+
+
+def load_budgets():
+    if not os.path.exists(BUDGETS_PATH):
+        return {}
+    with open(BUDGETS_PATH, encoding='utf-8') as budgets:
+        return json.load(budgets)
+
+
+def save_budgets(measured):
+    budgets = {
+        name: {
+            'queries': len(result['sql']),
+            'sql_ms': round(max(result['sql_ms'] * TIME_SLACK, MIN_TIME_MS)),
+            'render_ms': round(
+                max(result['render_ms'] * TIME_SLACK, MIN_TIME_MS)),
+            'sql': result['sql'],
+        }
+        for name, result in sorted(measured.items())
+    }
+    with open(BUDGETS_PATH, 'w', encoding='utf-8') as output:
+        json.dump(budgets, output, ensure_ascii=False, indent=2)
+        output.write('\n')
+
+
+def check(name, result, budget):
+    """Список превышений числа запросов адреса name, пустой если их нет."""
+    if budget is None:
+        return [f'{name}: нет бюджета, пересчитайте с {UPDATE_ENV}=1']
+    if len(result['sql']) <= budget['queries']:
+        return []
+    diff = difflib.unified_diff(
+        budget['sql'], result['sql'], 'budgets.json', 'сейчас', lineterm='')
+    return [
+        f'{name}: {len(result["sql"])} запросов вместо '
+        f'{budget["queries"]}\n' + '\n'.join(diff)
+    ]
+
+
+def check_time(name, result, budget):
+    """Превышения потолков времени; ошибки только с TIME_ENV=1."""
+    if budget is None:
+        return []
+    return [
+        f'{name}: {key} {result[key]:.1f} больше {budget[key]}'
+        for key in ('sql_ms', 'render_ms')
+        if result[key] > budget[key]
+    ]
@@ -0,0 +1,103 @@
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+USER_NAME = 'demo'
+GROUP_SLUG = 'gruppa'
+URL_POSTS = reverse('api_v1:posts')
+URL_GROUP_POSTS = reverse('api_v1:group_posts', args=[GROUP_SLUG])
+URL_USER = reverse('api_v1:user', args=[USER_NAME])
+URL_USER_POSTS = reverse('api_v1:user_posts', args=[USER_NAME])
+URL_FOLLOW = reverse('api_v1:follow')
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username=USER_NAME)
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='группа', description='описание', slug=GROUP_SLUG)
+        cls.posts = [
+            Post.objects.create(
+                text=f'публикация {counter}', author=cls.user,
+                group=cls.group if counter % 2 else None)
+            for counter in range(5)
+        ]
+        cls.post = cls.posts[-1]
+        for counter in range(3):
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f'ответ {counter}')
+        cls.URL_POST = reverse('api_v1:post', args=[cls.post.pk])
+        cls.URL_COMMENTS = reverse('api_v1:post_comments', args=[cls.post.pk])
+
+    def setUp(self):
+        self.client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feeds(self):
+        """Ленты API совпадают с лентами страниц"""
+        cases = {
+            URL_POSTS: self.posts,
+            URL_GROUP_POSTS: self.posts[1::2],
+            URL_USER_POSTS: self.posts,
+        }
+        for url, posts in cases.items():
+            with self.subTest(url=url):
+                results = self.client.get(url).json()['results']
+                self.assertEqual([post['id'] for post in results],
+                                 [post.pk for post in reversed(posts)])
+        post = self.client.get(self.URL_POST).json()
+        self.assertEqual(post['author'], USER_NAME)
+        self.assertEqual(post['comment_count'], 3)
+        user = self.client.get(URL_USER).json()
+        self.assertEqual(user['posts'], 5)
+
+    def test_cursor_and_fields(self):
+        """Курсор листает ленту, fields оставляет только нужные поля"""
+        first = self.client.get(
+            URL_POSTS, {'limit': 2, 'fields': 'id,text'}).json()
+        self.assertEqual(set(first['results'][0]), {'id', 'text'})
+        second = self.client.get(
+            URL_POSTS, {'limit': 2, 'cursor': first['next']}).json()
+        self.assertEqual(second['results'][0]['id'], self.posts[2].pk)
+        comments = self.client.get(self.URL_COMMENTS, {'limit': 2}).json()
+        self.assertEqual(len(comments['results']), 2)
+        rest = self.client.get(
+            self.URL_COMMENTS, {'cursor': comments['next']}).json()
+        self.assertEqual(rest['results'][0]['text'], 'ответ 0')
+        response = self.client.get(URL_POSTS, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_etag(self):
+        """Неизменившийся ответ отдаётся как 304"""
+        etag = self.client.get(URL_POSTS)['ETag']
+        response = self.client.get(URL_POSTS, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(text='свежая публикация', author=self.user)
+        response = self.client.get(URL_POSTS, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_follow(self):
+        """Лента подписок доступна только после входа"""
+        self.assertEqual(self.client.get(URL_FOLLOW).status_code, 401)
+        etag = self.reader_client.get(URL_FOLLOW)['ETag']
+        Follow.objects.create(user=self.reader, author=self.user)
+        response = self.reader_client.get(
+            URL_FOLLOW, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(len(response.json()['results']), 5)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_follow_prolific_etag(self):
+        """Новая публикация популярного автора меняет ETag ленты"""
+        Follow.objects.create(user=self.reader, author=self.user)
+        etag = self.reader_client.get(URL_FOLLOW)['ETag']
+        # bulk_create не меняет поколение лент.
+        Post.objects.bulk_create(
+            [Post(text='свежая публикация', author=self.user)])
+        response = self.reader_client.get(
+            URL_FOLLOW, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 6)
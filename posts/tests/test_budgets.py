@@ -0,0 +1,101 @@
+import os
+import shutil
+import sys
+import tempfile
+from io import StringIO
+
+from django.test import TestCase, override_settings
+
+from posts import urls as posts_urls
+from posts.benchmark import benchmark_urls, reader
+from posts.fingerprints import fingerprint
+from posts.seeding import Seeder
+
+from .budgets import (TIME_ENV, UPDATE_ENV, check, check_time,
+                      load_budgets, measure, save_budgets)
+
+# Страницы ошибок отвечают 404 и 500 по назначению.
+ERROR_PAGES = {'page_not_found', 'server_error'}
+
+
+class ViewBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Картинки сидера пишутся во временный каталог вне репозитория.
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        Seeder(
+            users=30, groups=4, posts=150, comments=120, follows=80,
+            images=2, image_ratio=0.3, alpha=1.1, days=30, seed=0,
+            prefix='budget', batch_size=100,
+        ).run(StringIO())
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def test_view_budgets(self):
+        """Представления укладываются в бюджеты из budgets.json"""
+        self.client.force_login(reader())
+        urls = [
+            (name, url)
+            for name, url in benchmark_urls(((posts_urls, ''),))
+            if name not in ERROR_PAGES
+        ]
+        measured = {name: measure(self.client, url) for name, url in urls}
+        for name, result in measured.items():
+            self.assertLess(result['status'], 400, name)
+        if os.environ.get(UPDATE_ENV):
+            save_budgets(measured)
+            return
+        budgets = load_budgets()
+        errors = [
+            error
+            for name, result in measured.items()
+            for error in check(name, result, budgets.get(name))
+        ]
+        slow = [
+            error
+            for name, result in measured.items()
+            for error in check_time(name, result, budgets.get(name))
+        ]
+        if os.environ.get(TIME_ENV):
+            errors += slow
+        elif slow:
+            sys.stderr.write(
+                '\nПотолки времени превышены (только отчёт):\n'
+                + '\n'.join(slow) + '\n')
+        self.assertFalse(errors, '\n\n'.join(errors))
+
+    def test_check_shows_added_queries(self):
+        """Лишний запрос виден в диффе отпечатков"""
+        budget = {
+            'queries': 1, 'sql_ms': 50, 'render_ms': 50,
+            'sql': [fingerprint('SELECT 1 FROM "posts_post" WHERE id = 7')],
+        }
+        result = {
+            'sql': [fingerprint(sql) for sql in (
+                'SELECT 1 FROM "posts_post" WHERE id = 8',
+                'SELECT * FROM "auth_user" WHERE id IN (1, 2)',
+            )],
+            'sql_ms': 1, 'render_ms': 100,
+        }
+        [error] = check('index', result, budget)
+        self.assertIn('+SELECT * FROM "auth_user" WHERE id IN (...)', error)
+        self.assertNotIn('-SELECT', error)
+
+    def test_check_time_report(self):
+        """Время сверяется отдельно от числа запросов"""
+        budget = {'queries': 1, 'sql_ms': 50, 'render_ms': 50, 'sql': []}
+        result = {'sql': ['SELECT ?'], 'sql_ms': 1, 'render_ms': 100}
+        self.assertEqual(check('index', result, budget), [])
+        self.assertEqual(
+            check_time('index', result, budget),
+            ['index: render_ms 100.0 больше 50'])
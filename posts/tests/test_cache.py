@@ -0,0 +1,80 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+
+from yatube.runtime import private_directory
+from yatube.sqlite_cache import SQLiteCache
+
+
+def increment(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {
+            'OPTIONS': {'MAX_ENTRIES': 10, 'MAX_BYTES': 4096},
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_get_set(self):
+        """Значения сохраняются, заменяются и удаляются"""
+        self.cache.set('key', {'value': 1})
+        self.cache.set('key', {'value': 2})
+        self.assertEqual(self.cache.get('key'), {'value': 2})
+        self.assertFalse(self.cache.add('key', 3))
+        self.assertEqual(
+            self.cache.get_many(['key', 'missing']), {'key': {'value': 2}})
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.cache.set('expired', 1, timeout=0)
+        self.assertFalse(self.cache.has_key('expired'))
+
+    def test_limits(self):
+        """Кэш вытесняет давно не читавшиеся записи при переполнении"""
+        for counter in range(20):
+            self.cache.set(f'key{counter}', 'x' * 100)
+        self.assertLessEqual(
+            len(self.cache.get_many([f'key{i}' for i in range(20)])), 10)
+        self.assertEqual(self.cache.get('key19'), 'x' * 100)
+        self.cache.set('big', 'x' * 5000)
+        self.assertIsNone(self.cache.get('key19'))
+
+    def test_incr_across_processes(self):
+        """incr атомарен для нескольких процессов"""
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=increment, args=(self.location, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_private_directory(self):
+        """Каталог кэша создаётся закрытым, открытый не принимается"""
+        location = os.path.join(self.directory, 'runtime', 'cache.sqlite3')
+        SQLiteCache(location, {}).set('key', 1)
+        self.assertEqual(
+            os.stat(os.path.dirname(location)).st_mode & 0o777, 0o700)
+        shared = os.path.join(self.directory, 'shared')
+        os.mkdir(shared)
+        os.chmod(shared, 0o777)
+        with self.assertRaises(ImproperlyConfigured):
+            private_directory(shared)
+        os.symlink(self.directory, os.path.join(self.directory, 'link'))
+        with self.assertRaises(ImproperlyConfigured):
+            private_directory(os.path.join(self.directory, 'link'))
@@ -0,0 +1,112 @@
+from html.parser import HTMLParser
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.template import Context, engines
+from django.template.loader import render_to_string
+from django.test import TestCase
+
+from posts.benchmark import COMPILED_FEED, INCLUDE_FEED, feed_render
+from posts.fragments import attach_fragments
+from posts.models import Group, Post, User
+from posts.templatetags.feed import (FRAGMENT_TEMPLATE, ITEM_TEMPLATE,
+                                     compile_item)
+
+VOID_TAGS = {'img', 'source', 'br', 'input', 'meta', 'link'}
+
+
+class Balance(HTMLParser):
+    """Проверяет, что каждый открытый тег закрыт в том же документе."""
+
+    def __init__(self):
+        super().__init__()
+        self.stack = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in VOID_TAGS:
+            self.stack.append(tag)
+
+    def handle_endtag(self, tag):
+        if not self.stack or self.stack.pop() != tag:
+            raise AssertionError(f'Лишний </{tag}>')
+
+
+def balanced(html):
+    parser = Balance()
+    parser.feed(html)
+    parser.close()
+    return not parser.stack
+
+
+class FeedRenderTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='demo.author+1')
+        self.reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='<группа>', description='описание', slug='gruppa')
+        Post.objects.create(
+            text='первая\nстрока & <b>', author=self.author, group=group)
+        Post.objects.create(text='вторая', author=self.reader)
+        Post.objects.create(text='третья', author=self.author)
+        engine = engines['django'].engine
+        self.include = engine.from_string(INCLUDE_FEED)
+        self.compiled = engine.from_string(COMPILED_FEED)
+
+    def page(self):
+        posts = list(Post.objects.for_feed().order_by('-pub_date'))
+        # Публикация без фрагмента рендерит его шаблоном на месте.
+        attach_fragments(posts[1:])
+        return posts
+
+    def test_byte_identical(self):
+        """post_items даёт тот же HTML, что include в цикле"""
+        page = self.page()
+        for user in (AnonymousUser(), self.reader, self.author):
+            with self.subTest(user=user):
+                for autoescape in (True, False):
+                    context = {'page': page, 'user': user}
+                    self.assertEqual(
+                        self.compiled.render(
+                            Context(context, autoescape=autoescape)),
+                        self.include.render(
+                            Context(context, autoescape=autoescape)))
+
+    def test_unslotted_field(self):
+        """Поле без места подстановки отключает компиляцию варианта"""
+        engine = engines['django'].engine
+        item = engine.get_template(ITEM_TEMPLATE)
+        extended = engine.from_string(
+            item.source + '<p>{{ post.author.username }} {{ post.id }}</p>')
+        context = Context({'user': self.reader})
+        with self.assertLogs('posts.templatetags.feed', 'WARNING'):
+            self.assertIsNone(compile_item(extended, 'reader', context))
+        templates = {ITEM_TEMPLATE: extended}
+        get_template = engine.get_template
+        page = self.page()
+        with mock.patch.object(
+                engine, 'get_template',
+                lambda name: templates.get(name) or get_template(name)), \
+                self.assertLogs('posts.templatetags.feed', 'WARNING'):
+            html = self.compiled.render(
+                Context({'page': page, 'user': self.reader}))
+        for post in page:
+            self.assertIn(
+                f'<p>{post.author.username} {post.id}</p>', html)
+
+    def test_templates_balanced(self):
+        """Фрагмент и карточка закрывают все свои теги"""
+        post = Post.objects.for_feed().first()
+        self.assertTrue(balanced(
+            render_to_string(FRAGMENT_TEMPLATE, {'post': post})))
+        self.assertTrue(balanced(render_to_string(
+            ITEM_TEMPLATE, {'post': post, 'user': self.author})))
+
+    def test_views_use_post_items(self):
+        self.client.force_login(self.author)
+        response = self.client.get('/')
+        self.assertContains(response, 'Редактировать', count=2)
+        self.assertContains(response, 'Добавить комментарий', count=3)
+
+    def test_benchmark(self):
+        [result] = feed_render(sizes=[5], repeat=1)
+        self.assertTrue(result['identical'])
@@ -1,12 +1,18 @@
+import hashlib
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpRequest
+from django.http.multipartparser import MultiPartParser
 from django.urls import reverse
 from django.test import Client, TestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
 
 from posts.models import Group, Post, User
+from posts.uploads import LimitedUploadHandler, request_files
 
 
 URL_HOME_PAGE = reverse('index')
@@ -96,9 +102,10 @@ class PostCreateFormTest(TestCase):
         self.assertEqual(
             posts[0].author.username,
             self.user.username)
+        digest = hashlib.sha256(small_gif).hexdigest()
         self.assertEqual(
             posts[0].image.name,
-            'posts/small.gif')
+            f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif')
 
     def test_edit_post(self):
         """Форма редактирования изменяет запись не добавляя новой"""
@@ -125,3 +132,54 @@ class PostCreateFormTest(TestCase):
         self.assertEqual(
             post.author.username,
             self.post.author.username)
+
+    def upload(self, name='small.gif'):
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        return SimpleUploadedFile(
+            name=name,
+            content=small_gif,
+            content_type='image/gif'
+        )
+
+    def test_image_limits(self):
+        """Форма отклоняет слишком большие файлы и изображения"""
+        limits = (
+            {'MAX_UPLOAD_SIZE': 10},
+            {'MAX_IMAGE_PIXELS': 1},
+        )
+        for limit in limits:
+            with self.subTest(limit=limit), self.settings(**limit):
+                posts_count = Post.objects.count()
+                response = self.authorized_client.post(
+                    URL_NEW_POST,
+                    data={'text': 'публикация', 'image': self.upload()},
+                )
+                self.assertEqual(Post.objects.count(), posts_count)
+                self.assertTrue(response.context['form'].errors['image'])
+
+    def test_oversized_upload_not_consumed(self):
+        """Разбор запроса прерывается, остаток файла не читается"""
+        body = encode_multipart(BOUNDARY, {
+            'text': 'публикация',
+            'image': SimpleUploadedFile('big.gif', b'x' * 2 ** 20),
+        })
+        stream = BytesIO(body)
+        request = HttpRequest()
+        meta = {
+            'CONTENT_TYPE': MULTIPART_CONTENT,
+            'CONTENT_LENGTH': len(body),
+        }
+        with self.settings(MAX_UPLOAD_SIZE=1024):
+            post, request.FILES = MultiPartParser(
+                meta, stream, [LimitedUploadHandler(request)],
+                'utf-8').parse()
+        self.assertLess(stream.tell(), len(body) // 4)
+        self.assertEqual(post['text'], 'публикация')
+        self.assertGreater(request_files(request)['image'].received, 1024)
@@ -0,0 +1,95 @@
+import os
+import re
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.metrics import BUCKETS, MetricsFile
+from posts.models import Post, User
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        settings = self.settings(
+            METRICS_ENABLED=True,
+            METRICS_FILE=os.path.join(self.directory, 'metrics.mmap'),
+            METRICS_TOKEN='secret')
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = User.objects.create_user(username='demo')
+        Post.objects.create(text='публикация', author=self.user)
+        cache.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def scrape(self):
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def value(self, text, sample):
+        match = re.search(
+            rf'^{re.escape(sample)} (\S+)$', text, re.MULTILINE)
+        return float(match.group(1)) if match else 0
+
+    def test_counters_and_histogram(self):
+        """Запросы, корзины, кэш и SQL считаются по имени адреса"""
+        for _ in range(2):
+            self.client.get(reverse('index'))
+        self.client.get('/нет/такого/адреса/')
+        text = self.scrape()
+        self.assertEqual(self.value(
+            text, 'yatube_http_requests_total{view="index"}'), 2)
+        self.assertEqual(self.value(
+            text,
+            'yatube_http_request_duration_seconds_bucket'
+            '{view="index",le="+Inf"}'), 2)
+        self.assertGreater(self.value(
+            text, 'yatube_db_queries_total{view="index"}'), 0)
+        self.assertGreater(self.value(
+            text, 'yatube_cache_hits_total{view="index"}'), 0)
+        self.assertGreater(self.value(
+            text, 'yatube_cache_misses_total{view="index"}'), 0)
+        self.assertIn('{view="unresolved"}', text)
+        buckets = re.findall(
+            r'_bucket\{view="index",le="([^"]+)"\}', text)
+        self.assertEqual(buckets, [str(bucket) for bucket in BUCKETS] + [
+            '+Inf'])
+
+    def test_protected(self):
+        """Без токена метрики видят только сотрудники"""
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(
+            url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        for header in ('Bearer ключ', 'Bearer clé'):
+            self.assertEqual(self.client.get(
+                url, HTTP_AUTHORIZATION=header).status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_disabled(self):
+        """Без METRICS_ENABLED файл не пишется, а адрес не отвечает"""
+        path = os.path.join(self.directory, 'disabled.mmap')
+        with self.settings(METRICS_ENABLED=False, METRICS_FILE=path):
+            self.client.get(reverse('index'))
+            response = self.client.get(
+                reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(os.path.exists(path))
+
+    def test_shared_between_mappings(self):
+        """Два отображения одного файла складывают значения"""
+        path = os.path.join(self.directory, 'shared.mmap')
+        first, second = MetricsFile(path, 16), MetricsFile(path, 16)
+        first.add({'a x ': 1})
+        second.add({'a x ': 2, 'b x ': 5})
+        self.assertEqual(sorted(first.items()), [('a x ', 3), ('b x ', 5)])
@@ -1,6 +1,11 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
 
-from posts.models import Group, Post, User
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+from posts.stats import stats_for
 
 
 class GroupModelTest(TestCase):
@@ -67,3 +72,69 @@ class PostModelTest(TestCase):
             f'{self.post.group} '
             f'{self.post.text[:15]}...')
         self.assertEquals(expected_object_name, str(self.post))
+
+    def test_comment_count(self):
+        """Счётчик комментариев следует за созданием и удалением"""
+        comment = Comment.objects.create(
+            post=self.post, author=self.post.author, text='комментарий')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_save_keeps_comment_count(self):
+        """Правка публикации не затирает комментарии, добавленные за время"""
+        post = Post.objects.get(pk=self.post.pk)
+        Comment.objects.create(
+            post=self.post, author=self.post.author, text='комментарий')
+        post.text = 'исправленный текст'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(
+            (post.text, post.comment_count), ('исправленный текст', 1))
+
+    def test_rebuild_comment_counts(self):
+        """Команда rebuild_comment_counts восстанавливает счётчики"""
+        Comment.objects.create(
+            post=self.post, author=self.post.author, text='комментарий')
+        Post.objects.update(comment_count=5)
+        call_command('rebuild_comment_counts', chunk_size=1, stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+
+class UserStatsTest(TestCase):
+    def test_counters(self):
+        """Статистика следует за подписками и публикациями"""
+        author = User.objects.create_user(username='demo')
+        reader = User.objects.create_user(username='demon')
+        self.assertEqual(stats_for(author.pk).followers, 0)
+        stats_for(reader.pk)
+        follow = Follow.objects.create(user=reader, author=author)
+        Post.objects.create(text='публикация', author=author)
+        stats = stats_for(author.pk)
+        self.assertEqual((stats.followers, stats.posts), (1, 1))
+        self.assertEqual(stats_for(reader.pk).following, 1)
+        follow.delete()
+        self.assertEqual(stats_for(author.pk).followers, 0)
+
+    def test_concurrent_first_read(self):
+        """Строка, созданная параллельным запросом, читается без ошибки"""
+        author = User.objects.create_user(username='demo')
+        stats_for(author.pk)
+        UserStats.objects.update(posts=7)
+        # Параллельный запрос создал строку между чтением и вставкой.
+        with mock.patch.object(UserStats.objects, 'get',
+                               side_effect=UserStats.DoesNotExist):
+            self.assertEqual(stats_for(author.pk).posts, 7)
+        self.assertEqual(UserStats.objects.filter(user=author).count(), 1)
+
+    def test_rebuild_user_stats(self):
+        """Команда rebuild_user_stats восстанавливает статистику"""
+        author = User.objects.create_user(username='demo')
+        Post.objects.create(text='публикация', author=author)
+        stats_for(author.pk)
+        UserStats.objects.update(posts=7)
+        call_command('rebuild_user_stats', stdout=StringIO())
+        self.assertEqual(stats_for(author.pk).posts, 1)
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.template.base import Template
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+from posts.profiling import slow_requests
+
+PROFILED_MIDDLEWARE = [
+    'posts.profiling.ProfilingMiddleware', *settings.MIDDLEWARE]
+
+
+@override_settings(MIDDLEWARE=PROFILED_MIDDLEWARE, PROFILING_SLOW_MS=0)
+class ProfilingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='demo')
+        Post.objects.create(text='публикация', author=self.user)
+
+    def test_server_timing(self):
+        """Ответ содержит время SQL, шаблонов, кэша и миниатюр"""
+        response = self.client.get(reverse('index'))
+        timing = response['Server-Timing']
+        for name in ('db', 'tpl', 'cache', 'thumb', 'total'):
+            self.assertIn(f'{name};dur=', timing)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertEqual(slow_requests()[0]['view'], 'index')
+
+    def test_admin_buffer(self):
+        """Буфер медленных запросов виден только сотрудникам"""
+        url = reverse('slow_requests')
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get(reverse('profile', args=['demo']))
+        response = self.client.get(url)
+        self.assertContains(response, '/demo/')
+        self.assertContains(response, 'profile')
+
+
+class UninstallTest(TestCase):
+    def test_restores_methods(self):
+        """Без middleware методы шаблонов возвращаются в исходный вид"""
+        render = Template.render
+        with override_settings(MIDDLEWARE=PROFILED_MIDDLEWARE):
+            Client().get(reverse('index'))
+            self.assertIsNot(Template.render, render)
+        self.assertIs(Template.render, render)
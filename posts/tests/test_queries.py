@@ -0,0 +1,58 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from yatube.settings import PER_PAGE
+
+
+USER_NAME = 'demo'
+GROUP_SLUG = 'gruppa'
+URL_API_POSTS = reverse('api_v1:posts')
+URL_API_FOLLOW = reverse('api_v1:follow')
+
+
+class QueryBudgetTest(TestCase):
+    """Число запросов страницы не зависит от числа публикаций на ней."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USER_NAME)
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='группа',
+            description='описание',
+            slug=GROUP_SLUG)
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        for counter in range(PER_PAGE):
+            post = Post.objects.create(
+                text=str(counter),
+                author=cls.user,
+                group=cls.group,
+            )
+            Comment.objects.create(
+                post=post, author=cls.reader, text=str(counter))
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_query_budgets(self):
+        # Бюджеты HTML-страниц проверяет test_budgets по budgets.json.
+        budgets = {
+            URL_API_POSTS: 3,
+            URL_API_FOLLOW: 7,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(budget):
+                    self.authorized_client.get(url)
+
+    def test_query_plans_use_indexes(self):
+        """Запросы лент не просматривают таблицы целиком"""
+        call_command('check_query_plans', stdout=StringIO())
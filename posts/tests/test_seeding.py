@@ -0,0 +1,49 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from posts.benchmark import percentile, run
+from posts.models import Comment, Follow, Post, TimelineEntry, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedingTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_seed_and_benchmark(self):
+        """Набор данных создаётся, а замеры проходят по всем адресам"""
+        call_command(
+            'seed_dataset', users=20, groups=3, posts=60, comments=40,
+            follows=50, images=2, image_ratio=0.5, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertEqual(Follow.objects.count(), 50)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        # Даты разбросаны по периоду, а не проставлены при вставке.
+        self.assertGreater(
+            Post.objects.values('pub_date').distinct().count(), 1)
+        self.assertGreater(
+            Comment.objects.values('created').distinct().count(), 1)
+        follow = Follow.objects.first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(
+                user=follow.user, post__author=follow.author).count(),
+            follow.author.posts.count())
+        report = run(repeat=1)
+        self.assertEqual(report['results']['index']['status'], 200)
+        self.assertEqual(report['results']['about:author']['status'], 200)
+        self.assertNotIn('profile_follow', report['results'])
+
+    def test_percentile(self):
+        self.assertEqual(percentile([3, 1, 2, 4], 50), 2)
+        self.assertEqual(percentile([3, 1, 2, 4], 95), 4)
@@ -0,0 +1,98 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Post, User
+
+LOGGED_MIDDLEWARE = [
+    'posts.slow_queries.SlowQueryLogMiddleware', *settings.MIDDLEWARE]
+
+
+class SlowQueryLogTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'slow.ndjson')
+        user = User.objects.create_user(username='demo')
+        Post.objects.create(text='публикация', author=user)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def read_log(self):
+        with open(self.path, encoding='utf-8') as lines:
+            return [json.loads(line) for line in lines]
+
+    def test_log_and_report(self):
+        """Запросы пишутся без литералов с именем представления"""
+        with self.settings(
+                MIDDLEWARE=LOGGED_MIDDLEWARE, SLOW_QUERY_LOG=self.path,
+                SLOW_QUERY_MS=0, SLOW_QUERY_SAMPLE_RATE=1):
+            self.client.get(reverse('profile', args=['demo']))
+        records = self.read_log()
+        self.assertTrue(records)
+        self.assertEqual({record['view'] for record in records}, {'profile'})
+        self.assertFalse(any(
+            "'demo'" in record['fingerprint'] for record in records))
+        output = StringIO()
+        call_command('slow_query_report', log=self.path, top=1, stdout=output)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn('profile', lines[1])
+
+    def test_fast_queries_skipped(self):
+        with self.settings(
+                MIDDLEWARE=LOGGED_MIDDLEWARE, SLOW_QUERY_LOG=self.path,
+                SLOW_QUERY_MS=10 ** 6):
+            self.client.get(reverse('index'))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_report_weights_samples(self):
+        """Суммарное время учитывает долю выборки"""
+        with open(self.path, 'w', encoding='utf-8') as log:
+            for fingerprint, ms, rate in (
+                    ('SELECT ?', 10, 0.5), ('SELECT ?', 10, 0.5),
+                    ('UPDATE ?', 30, 1)):
+                log.write(json.dumps({
+                    'view': 'index', 'fingerprint': fingerprint, 'ms': ms,
+                    'sample_rate': rate,
+                }) + '\n')
+        output = StringIO()
+        call_command('slow_query_report', log=self.path, stdout=output)
+        lines = output.getvalue().splitlines()
+        self.assertIn('40.0', lines[1])
+        self.assertEqual(lines[2].strip(), 'SELECT ?')
+
+    def test_report_reads_rotated_copies(self):
+        """Отчёт читает и копии logrotate, в том числе сжатые"""
+        record = json.dumps({
+            'view': 'index', 'fingerprint': 'SELECT ?', 'ms': 10,
+            'sample_rate': 1,
+        }) + '\n'
+        with open(self.path, 'w', encoding='utf-8') as log:
+            log.write(record)
+        with open(f'{self.path}.1', 'w', encoding='utf-8') as log:
+            log.write(record)
+        with gzip.open(f'{self.path}.2.gz', 'wt', encoding='utf-8') as log:
+            log.write(record)
+        output = StringIO()
+        call_command('slow_query_report', log=self.path, stdout=output)
+        self.assertIn('30.0', output.getvalue().splitlines()[1])
+
+    def test_reopens_rotated_log(self):
+        """После переименования журнала записи идут в новый файл"""
+        options = dict(
+            MIDDLEWARE=LOGGED_MIDDLEWARE, SLOW_QUERY_LOG=self.path,
+            SLOW_QUERY_MS=0, SLOW_QUERY_SAMPLE_RATE=1)
+        with self.settings(**options):
+            self.client.get(reverse('profile', args=['demo']))
+            os.rename(self.path, f'{self.path}.1')
+            self.client.get(reverse('profile', args=['demo']))
+        self.assertTrue(self.read_log())
@@ -0,0 +1,89 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+DIGEST = hashlib.sha256(SMALL_GIF).hexdigest()
+HASHED_NAME = f'posts/{DIGEST[:2]}/{DIGEST[2:4]}/{DIGEST}.gif'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='demo')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_same_content_same_file(self):
+        """Одинаковые картинки хранятся одним файлом"""
+        posts = [
+            Post.objects.create(
+                text='публикация', author=self.user,
+                image=SimpleUploadedFile(name, SMALL_GIF))
+            for name in ('first.gif', 'second.GIF')
+        ]
+        self.assertEqual(posts[0].image.name, HASHED_NAME)
+        self.assertEqual(posts[1].image.name, HASHED_NAME)
+        self.assertEqual(
+            default_storage.listdir(HASHED_NAME.rsplit('/', 1)[0])[1],
+            [f'{DIGEST}.gif'])
+
+    def test_dedupe_command(self):
+        """Команда сливает существующие дубликаты в один файл"""
+        flat = f'posts/{DIGEST}.gif'
+        for name in ('posts/a.gif', 'posts/b.gif', flat):
+            default_storage.save(name, ContentFile(SMALL_GIF))
+            Post.objects.create(text='публикация', author=self.user,
+                                image=name)
+        call_command('dedupe_post_images', stdout=StringIO())
+        self.assertEqual(
+            set(Post.objects.values_list('image', flat=True)), {HASHED_NAME})
+        self.assertFalse(default_storage.exists('posts/a.gif'))
+        self.assertFalse(default_storage.exists('posts/b.gif'))
+        self.assertFalse(default_storage.exists(flat))
+        self.assertTrue(default_storage.exists(HASHED_NAME))
+
+    def test_save_restores_missing_file(self):
+        """Сохранение заново записывает удалённый файл"""
+        storage = Post._meta.get_field('image').storage
+        storage.save('posts/first.gif', ContentFile(SMALL_GIF))
+        storage.delete(HASHED_NAME)
+        self.assertEqual(
+            storage.save('posts/second.gif', ContentFile(SMALL_GIF)),
+            HASHED_NAME)
+        self.assertTrue(storage.exists(HASHED_NAME))
+
+    def test_gc_command(self):
+        """Команда удаляет старые файлы без публикаций"""
+        storage = Post._meta.get_field('image').storage
+        used = Post.objects.create(
+            text='публикация', author=self.user,
+            image=SimpleUploadedFile('used.gif', SMALL_GIF + b'1')).image.name
+        unused = storage.save('posts/unused.gif', ContentFile(SMALL_GIF))
+        fresh = storage.save('posts/fresh.gif', ContentFile(SMALL_GIF + b'2'))
+        for name in (used, unused):
+            os.utime(storage.path(name), (0, 0))
+        call_command('gc_post_images', stdout=StringIO())
+        self.assertTrue(storage.exists(used))
+        self.assertFalse(storage.exists(unused))
+        self.assertTrue(storage.exists(fresh))
@@ -0,0 +1,82 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from posts.feed_cache import feed_generation
+from posts.fragments import attach_fragments, fragment_key
+from posts.models import Post, User
+from posts.thumbnails import (POST_THUMBNAILS, QUEUED_TIMEOUT, Placeholder,
+                              QueuedThumbnailBackend, generate_thumbnails,
+                              image_variants)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_placeholder_until_generated(self):
+        """Пока миниатюры нет, шаблон получает заглушку её размера"""
+        content = BytesIO()
+        Image.new('RGB', (40, 30), 'red').save(content, 'JPEG')
+        post = Post.objects.create(
+            text='публикация',
+            author=User.objects.create_user(username='demo'),
+            image=SimpleUploadedFile('thumb.jpg', content.getvalue()),
+        )
+        geometry, options = POST_THUMBNAILS[-1]
+        backend = QueuedThumbnailBackend()
+        thumbnail = backend.get_thumbnail(post.image, geometry, **options)
+        self.assertIsInstance(thumbnail, Placeholder)
+        self.assertEqual((thumbnail.width, thumbnail.height), (960, 339))
+        generate_thumbnails(post.image.name)
+        thumbnail = backend.get_thumbnail(post.image, geometry, **options)
+        self.assertNotIsInstance(thumbnail, Placeholder)
+        self.assertTrue(thumbnail.url.endswith('.jpg'))
+
+    def test_variants(self):
+        """Для картинки готовятся WebP и JPEG всех ширин для srcset"""
+        content = BytesIO()
+        Image.new('RGB', (40, 30), 'red').save(content, 'PNG')
+        post = Post.objects.create(
+            text='публикация',
+            author=User.objects.create_user(username='demo'),
+            image=SimpleUploadedFile('variants.png', content.getvalue()),
+        )
+        self.assertNotIn('jpeg', image_variants(post.image))
+        generate_thumbnails(post.image.name)
+        variants = image_variants(post.image)
+        self.assertEqual(variants['webp'].count('.webp'), 3)
+        self.assertEqual(variants['jpeg'].count('.jpg'), 3)
+        self.assertIn('960w', variants['jpeg'])
+        self.assertEqual((variants['width'], variants['height']), (960, 339))
+
+    def test_failure_resets_fragment(self):
+        """После ошибки фрагмент с заглушкой сбрасывается"""
+        post = Post.objects.create(
+            text='публикация',
+            author=User.objects.create_user(username='demo'),
+            image=SimpleUploadedFile('broken.jpg', b'not an image'),
+        )
+        post = Post.objects.for_feed().get(pk=post.pk)
+        with mock.patch.object(cache, 'set_many') as set_many:
+            attach_fragments([post])
+        set_many.assert_called_once_with(
+            {fragment_key(post): post.fragment}, QUEUED_TIMEOUT)
+        attach_fragments([post])
+        generation = feed_generation()
+        with self.assertLogs('posts.thumbnails', 'ERROR'):
+            generate_thumbnails(post.image.name)
+        self.assertIsNone(cache.get(fragment_key(post)))
+        self.assertNotEqual(feed_generation(), generation)
@@ -0,0 +1,83 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+
+from posts.models import Follow, Post, TimelineEntry, User
+from posts.timeline import timeline_page, timeline_posts
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='demo')
+        cls.reader = User.objects.create_user(username='demon')
+
+    def test_fan_out_on_write(self):
+        """Новая публикация попадает в ленту подписчика"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='публикация', author=self.author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(list(timeline_posts(self.reader)), [post])
+
+    def test_backfill_and_prune(self):
+        """Подписка заполняет ленту, отписка очищает её"""
+        post = Post.objects.create(text='публикация', author=self.author)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(list(timeline_posts(self.reader)), [post])
+        follow.delete()
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+
+    @override_settings(TIMELINE_MAX_LENGTH=2, TIMELINE_TRIM_SLACK=1)
+    def test_max_length(self):
+        """Команда обрезает до TIMELINE_MAX_LENGTH только длинные ленты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(text=str(counter), author=self.author)
+            for counter in range(3)
+        ]
+        call_command('trim_timelines', stdout=StringIO())
+        entries = TimelineEntry.objects.filter(user=self.reader)
+        self.assertEqual(entries.count(), 3)
+        posts.append(Post.objects.create(text='3', author=self.author))
+        call_command('trim_timelines', stdout=StringIO())
+        self.assertEqual(
+            list(entries.order_by('-pub_date', '-id').values_list(
+                'post_id', flat=True)),
+            [posts[3].pk, posts[2].pk])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_prolific_author_read_fallback(self):
+        """Публикации популярного автора читаются без рассылки"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='публикация', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        self.assertEqual(list(timeline_posts(self.reader)), [post])
+
+    def test_prolific_pages_merged(self):
+        """Лента с популярными авторами листается без пропусков и повторов"""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=other)
+        posts = []
+        for counter in range(5):
+            posts.append(Post.objects.create(
+                text=str(counter), author=self.author))
+            posts.append(Post.objects.create(text=str(counter), author=other))
+        posts.reverse()
+        seen = []
+        cursor = ''
+        with override_settings(TIMELINE_FANOUT_LIMIT=0):
+            while cursor is not None:
+                request = RequestFactory().get('/follow/', {'cursor': cursor})
+                page = timeline_page(request, self.reader, 3)
+                seen.extend(page)
+                cursor = page.next_cursor
+            request = RequestFactory().get(
+                '/follow/', {'cursor': page.previous_cursor})
+            previous = timeline_page(request, self.reader, 3)
+        self.assertEqual(seen, posts)
+        self.assertEqual(list(previous), posts[6:9])
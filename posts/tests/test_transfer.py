@@ -0,0 +1,80 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.search import search_posts
+from posts.stats import stats_for
+
+
+class TransferTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'dump.ndjson')
+        author = User.objects.create_user(username='demo')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='группа', description='описание', slug='gruppa')
+        for counter in range(3):
+            post = Post.objects.create(
+                text=f'публикация {counter}', author=author, group=group)
+            Comment.objects.create(post=post, author=reader, text='ответ')
+        Follow.objects.create(user=reader, author=author)
+        self.dates = list(Post.objects.values_list('pub_date', flat=True))
+        self.created = list(
+            Comment.objects.values_list('created', flat=True))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_export_import(self):
+        """Выгрузка загружается в пустую базу и повторно не дублируется"""
+        call_command('export_ndjson', self.path, stderr=StringIO())
+        Follow.objects.all().delete()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        for _ in range(2):
+            call_command('import_ndjson', self.path, batch_size=2,
+                         stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertEqual(Comment.objects.count(), 3)
+        self.assertEqual(
+            list(Post.objects.values_list('pub_date', flat=True)),
+            self.dates)
+        self.assertEqual(
+            list(Comment.objects.values_list('created', flat=True)),
+            self.created)
+        reader = User.objects.get(username='reader')
+        author = User.objects.get(username='demo')
+        self.assertTrue(Follow.objects.filter(user=reader, author=author))
+        self.assertEqual(reader.timeline.count(), 3)
+        self.assertEqual(stats_for(author.pk).followers, 1)
+        self.assertEqual(
+            set(Post.objects.values_list('comment_count', flat=True)), {1})
+        self.assertEqual(len(search_posts('публикация', 0, 10)), 3)
+
+    def test_existing_follower_timeline(self):
+        """Публикации загруженного автора попадают в ленты подписчиков"""
+        call_command('export_ndjson', self.path, stderr=StringIO())
+        author = User.objects.get(username='demo')
+        follower = User.objects.create_user(username='follower')
+        Follow.objects.create(user=follower, author=author)
+        Post.objects.filter(author=author).delete()
+        call_command('import_ndjson', self.path, stdout=StringIO())
+        self.assertEqual(follower.timeline.count(), 3)
+
+    def test_pk_clash(self):
+        """Ключ, занятый другой записью, останавливает загрузку"""
+        call_command('export_ndjson', self.path, stderr=StringIO())
+        Post.objects.filter(pk=Post.objects.first().pk).update(text='чужая')
+        # Сдвиг, рассчитанный до того, как в таблицу записали новые строки.
+        with open(f'{self.path}.state', 'w', encoding='utf-8') as state:
+            json.dump({'line': 0, 'offsets': dict.fromkeys(
+                ('post', 'comment', 'follow'), 0)}, state)
+        with self.assertRaisesMessage(CommandError, 'posts.Post'):
+            call_command('import_ndjson', self.path, stdout=StringIO())
@@ -1,7 +1,9 @@
+from django.core.cache import cache
 from django.urls import reverse
 from django.test import Client, TestCase
 
-from posts.models import Follow, Group, Post, User
+from posts.fragments import fragment_key
+from posts.models import Comment, Follow, Group, Post, User
 from yatube.settings import PER_PAGE
 
 
@@ -16,6 +18,7 @@ URL_OTHER_GROUP_POST = reverse('group_posts', args=[OTHER_GROUP_SLUG])
 URL_FOLLOW_INDEX = reverse('follow_index')
 URL_FOLLOW = reverse('profile_follow', args=[USER_NAME])
 URL_UNFOLLOW = reverse('profile_unfollow', args=[USER_NAME])
+URL_SEARCH = reverse('search')
 
 
 class PostPagesTests(TestCase):
@@ -122,6 +125,129 @@ class PostPagesTests(TestCase):
         response = self.authorized_client.get(URL_HOME_PAGE)
         self.assertEqual(len(response.context['page']), PER_PAGE)
 
+    def test_cursor_paginator(self):
+        """Курсоры ведут на следующую и обратно на предыдущую страницу"""
+        for counter in range(1, PER_PAGE + 2):
+            Post.objects.create(
+                text=str(counter),
+                author=self.user,
+            )
+        first = self.authorized_client.get(URL_HOME_PAGE).context['page']
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+        second = self.authorized_client.get(
+            URL_HOME_PAGE, {'cursor': first.next_cursor}
+        ).context['page']
+        self.assertEqual(len(second), 2)
+        self.assertFalse(second.has_next())
+        self.assertNotIn(second[0], list(first))
+        back = self.authorized_client.get(
+            URL_HOME_PAGE, {'cursor': second.previous_cursor}
+        ).context['page']
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_index_cache(self):
+        """Кэш главной учитывает курсор и сбрасывается новой публикацией"""
+        for counter in range(1, PER_PAGE + 2):
+            Post.objects.create(
+                text=f'публикация {counter}',
+                author=self.user,
+            )
+        first = self.authorized_client.get(URL_HOME_PAGE)
+        # Попадание в кэш не читает ленту: только сессия и пользователь.
+        with self.assertNumQueries(2):
+            cached = self.authorized_client.get(URL_HOME_PAGE)
+        self.assertEqual(cached.content, first.content)
+        second = self.authorized_client.get(
+            URL_HOME_PAGE, {'cursor': first.context['page'].next_cursor})
+        self.assertNotEqual(first.content, second.content)
+        Post.objects.create(text='свежая публикация', author=self.user)
+        response = self.authorized_client.get(URL_HOME_PAGE)
+        self.assertContains(response, 'свежая публикация')
+
+    def test_post_fragment_cache(self):
+        """Фрагмент публикации кэшируется и меняется вместе с ней"""
+        self.authorized_client.get(URL_GROUP_POSTS)
+        self.assertIsNotNone(cache.get(fragment_key(self.post)))
+        Comment.objects.create(
+            post=self.post, author=self.other_user, text='комментарий')
+        response = self.authorized_client.get(URL_GROUP_POSTS)
+        self.assertContains(response, 'Комментариев: 1')
+        self.assertContains(response, 'Добавить комментарий')
+
+    def test_conditional_get(self):
+        """Неизменившаяся страница отдаётся ответом 304 без запросов"""
+        guest_client = Client()
+        etag = guest_client.get(URL_HOME_PAGE)['ETag']
+        with self.assertNumQueries(0):
+            response = guest_client.get(URL_HOME_PAGE, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(text='свежая публикация', author=self.user)
+        response = guest_client.get(URL_HOME_PAGE, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'свежая публикация')
+        etag = self.authorized_client.get(URL_PROFILE)['ETag']
+        Follow.objects.create(user=self.other_user, author=self.user)
+        response = self.authorized_client.get(
+            URL_PROFILE, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_author_name(self):
+        """Смена имени автора меняет ETag профиля и публикации"""
+        etags = {
+            url: self.authorized_client.get(url)['ETag']
+            for url in (URL_PROFILE, self.URL_VIEW_POST)
+        }
+        User.objects.filter(pk=self.user.pk).update(first_name='Новое')
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertContains(response, 'Новое')
+
+    def test_rename_resets_feeds(self):
+        """Переименование пользователя сбрасывает кэш и ETag лент"""
+        etag = self.authorized_client.get(URL_HOME_PAGE)['ETag']
+        user = User.objects.get(pk=self.user.pk)
+        user.username = 'renamed'
+        user.save()
+        response = self.authorized_client.get(
+            URL_HOME_PAGE, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, '@renamed')
+        etag = response['ETag']
+        self.client.force_login(user)
+        self.assertEqual(self.authorized_client.get(
+            URL_HOME_PAGE, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_search(self):
+        """Поиск находит публикации и следит за их изменением"""
+        post = Post.objects.create(text='редкое слово', author=self.user)
+        response = self.authorized_client.get(URL_SEARCH, {'q': 'Редкое'})
+        self.assertEqual(list(response.context['page']), [post])
+        post.text = 'другой текст'
+        post.save()
+        response = self.authorized_client.get(URL_SEARCH, {'q': 'редкое'})
+        self.assertEqual(len(response.context['page']), 0)
+        response = self.authorized_client.get(URL_SEARCH, {'q': 'другой'})
+        self.assertEqual(list(response.context['page']), [post])
+        post.delete()
+        response = self.authorized_client.get(URL_SEARCH, {'q': 'другой'})
+        self.assertEqual(len(response.context['page']), 0)
+
+    def test_search_page_number(self):
+        """Битый номер страницы поиска даёт первую, лишний — 404"""
+        post = Post.objects.create(text='редкое слово', author=self.user)
+        for number in ('abc', '0', '-3'):
+            with self.subTest(number=number):
+                response = self.authorized_client.get(
+                    URL_SEARCH, {'q': 'редкое', 'page': number})
+                self.assertEqual(list(response.context['page']), [post])
+        for number in ('2', '9' * 40):
+            with self.subTest(number=number):
+                response = self.authorized_client.get(
+                    URL_SEARCH, {'q': 'редкое', 'page': number})
+                self.assertEqual(response.status_code, 404)
+
     def test_autorized_user_follow(self):
         """
         авторизованный пользователь может
@@ -129,14 +255,31 @@ class PostPagesTests(TestCase):
         """
         follower_client = Client()
         follower_client.force_login(self.other_user)
-        follower_client.get(URL_FOLLOW)
+        response = follower_client.post(URL_FOLLOW)
+        self.assertRedirects(response, URL_PROFILE)
         self.assertTrue(Follow.objects.all())
+        response = follower_client.post(
+            URL_FOLLOW, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json(), {'following': True, 'followers': 1})
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_follow_requires_post(self):
+        """Подписка и отписка не меняются запросом GET"""
+        follower_client = Client()
+        follower_client.force_login(self.other_user)
+        for url in (URL_FOLLOW, URL_UNFOLLOW):
+            with self.subTest(url=url):
+                self.assertEqual(follower_client.get(url).status_code, 405)
+        self.assertFalse(Follow.objects.all())
 
     def test_autorized_user_unfollow(self):
         follower_client = Client()
         follower_client.force_login(self.other_user)
         Follow.objects.create(user=self.other_user, author=self.user)
-        follower_client.get(URL_UNFOLLOW)
+        response = follower_client.post(
+            URL_UNFOLLOW, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.json(),
+                         {'following': False, 'followers': 0})
         self.assertFalse(Follow.objects.all())
 
     def test_user_comment(self):
@@ -154,10 +297,10 @@ class PostPagesTests(TestCase):
         """
         follower_client = Client()
         follower_client.force_login(self.other_user)
-        follower_client.get(URL_FOLLOW)
+        follower_client.post(URL_FOLLOW)
         unfollower_client = Client()
         unfollower_client.force_login(self.third_user)
         response = follower_client.get(URL_FOLLOW_INDEX)
-        self.assertTrue(response.context['post'])
+        self.assertIn(self.post, response.context['page'])
         response = unfollower_client.get(URL_FOLLOW_INDEX)
         self.assertEqual(len(response.context['page']), 0)
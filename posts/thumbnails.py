@@ -0,0 +1,212 @@
+"""
+Фоновая подготовка миниатюр публикаций.
+
+QueuedThumbnailBackend подключается как THUMBNAIL_BACKEND: если
+миниатюры ещё нет в хранилище ключей sorl, тег {% thumbnail %} получает
+заглушку нужного размера, а картинка ставится в очередь пула процессов.
+Пул создаёт все варианты из POST_THUMBNAILS средствами sorl, поэтому
+имена файлов и записи в хранилище ключей совпадают с теми, что создал
+бы сам sorl.
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import DummyImageFile, ImageFile
+
+logger = logging.getLogger(__name__)
+
+# Картинка публикации выводится кадром 960x339 нескольких ширин
+# в WebP и в JPEG для браузеров без поддержки WebP.
+POST_IMAGE_SIZE = (960, 339)
+POST_IMAGE_WIDTHS = (480, 720, 960)
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+POST_THUMBNAILS = tuple(
+    (
+        f'{width}x{round(width * POST_IMAGE_SIZE[1] / POST_IMAGE_SIZE[0])}',
+        {'crop': 'center', 'upscale': True, 'format': image_format},
+    )
+    for image_format in POST_IMAGE_FORMATS
+    for width in POST_IMAGE_WIDTHS
+)
+QUEUED_TIMEOUT = 60
+PLACEHOLDER_PREFIX = 'data:image/svg+xml,'
+
+_executor = None
+
+
+class Placeholder(DummyImageFile):
+    """Серый прямоугольник размера будущей миниатюры."""
+
+    @property
+    def url(self):
+        return (
+            PLACEHOLDER_PREFIX
+            + '%3Csvg xmlns=%22http://www.w3.org/2000/svg%22 '
+            f'width=%22{self.x}%22 height=%22{self.y}%22%3E'
+            '%3Crect width=%22100%25%22 height=%22100%25%22 '
+            'fill=%22%23e9ecef%22/%3E%3C/svg%3E'
+        )
+
+
+class QueuedThumbnailBackend(ThumbnailBackend):
+    def thumbnail_file(self, source, geometry_string, options):
+        """Файл миниатюры с теми же именем и опциями, что выбрал бы sorl."""
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        source = ImageFile(file_)
+        thumbnail = self.thumbnail_file(source, geometry_string, options)
+        cached = default.kvstore.get(thumbnail)
+        if cached:
+            return cached
+        queue_thumbnails(source.name)
+        return Placeholder(geometry_string)
+
+
+def _init_worker(settings_module):
+    os.environ['DJANGO_SETTINGS_MODULE'] = settings_module
+    import django
+    django.setup()
+
+
+def generate_thumbnails(name):
+    """
+    Создаёт недостающие миниатюры картинки; выполняется в процессе пула.
+
+    Исходная картинка декодируется один раз на все размеры и форматы,
+    уже созданные миниатюры пропускаются. Фрагменты публикаций с картинкой
+    сбрасываются и после ошибки: следующий рендер снова поставит картинку
+    в очередь, а не будет показывать заглушку до истечения кэша.
+    """
+    from .models import Post
+
+    backend = QueuedThumbnailBackend()
+    source = ImageFile(name, Post._meta.get_field('image').storage)
+    missing = []
+    for geometry, options in POST_THUMBNAILS:
+        options = dict(options)
+        thumbnail = backend.thumbnail_file(source, geometry, options)
+        if not default.kvstore.get(thumbnail):
+            missing.append((geometry, options, thumbnail))
+    if not missing:
+        return
+    try:
+        source_image = default.engine.get_image(source)
+    except Exception:
+        logger.exception('Не удалось открыть картинку %s', name)
+        invalidate_fragments(name)
+        return
+    try:
+        source.set_size(default.engine.get_image_size(source_image))
+        default.kvstore.get_or_set(source)
+        for geometry, options, thumbnail in missing:
+            if not thumbnail.exists():
+                backend._create_thumbnail(
+                    source_image, geometry, options, thumbnail)
+            default.kvstore.set(thumbnail, source)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', name)
+        invalidate_fragments(name)
+        return
+    finally:
+        default.engine.cleanup(source_image)
+    invalidate_fragments(name)
+
+
+def invalidate_fragments(name):
+    """Сбрасывает фрагменты публикаций с картинкой name и кэш лент."""
+    from .feed_cache import bump_feed_generation
+    from .fragments import fragment_key
+    from .models import Post
+
+    posts = Post.objects.for_feed().filter(image=name)
+    cache.delete_many([fragment_key(post) for post in posts])
+    bump_feed_generation()
+
+
+def image_variants(image):
+    """
+    Адреса миниатюр картинки для srcset.
+
+    Пока готовы не все миниатюры, возвращается заглушка без srcset,
+    а картинка ставится в очередь.
+    """
+    backend = QueuedThumbnailBackend()
+    source = ImageFile(image)
+    srcset = {image_format: [] for image_format in POST_IMAGE_FORMATS}
+    for geometry, options in POST_THUMBNAILS:
+        options = dict(options)
+        thumbnail = default.kvstore.get(
+            backend.thumbnail_file(source, geometry, options))
+        if not thumbnail:
+            queue_thumbnails(source.name)
+            placeholder = Placeholder('x'.join(map(str, POST_IMAGE_SIZE)))
+            return {
+                'src': placeholder.url,
+                'width': placeholder.width,
+                'height': placeholder.height,
+            }
+        srcset[options['format']].append(f'{thumbnail.url} {thumbnail.x}w')
+    return {
+        'src': thumbnail.url,
+        'width': thumbnail.x,
+        'height': thumbnail.y,
+        'webp': ', '.join(srcset['WEBP']),
+        'jpeg': ', '.join(srcset['JPEG']),
+    }
+
+
+def _executor_or_none():
+    global _executor
+    if settings.THUMBNAIL_WORKERS <= 0:
+        return None
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            mp_context=get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(settings.SETTINGS_MODULE,),
+        )
+    return _executor
+
+
+def _submit(name):
+    executor = _executor_or_none()
+    if executor is None:
+        generate_thumbnails(name)
+    else:
+        executor.submit(generate_thumbnails, name)
+
+
+def queue_thumbnails(name):
+    """
+    Ставит картинку в очередь на подготовку миниатюр.
+
+    Повторная постановка той же картинки в течение QUEUED_TIMEOUT секунд
+    пропускается; задача отправляется после фиксации транзакции, чтобы
+    пул видел сохранённую публикацию.
+    """
+    if not name or not cache.add(f'thumbnail_queued:{name}', True,
+                                 QUEUED_TIMEOUT):
+        return
+    transaction.on_commit(lambda: _submit(name))
@@ -0,0 +1,188 @@
+"""
+Материализованная лента «Избранные авторы».
+
+Новая публикация рассылается в ленты подписчиков автора при записи.
+Для авторов, у которых подписчиков больше TIMELINE_FANOUT_LIMIT,
+рассылка не делается: их публикации подмешиваются в ленту при чтении.
+
+Рассылка ленты не обрезает, чтобы запись публикации не зависела от
+длины лент подписчиков. Ленты длиннее TIMELINE_MAX_LENGTH больше чем
+на TIMELINE_TRIM_SLACK записей обрезает периодическая команда
+trim_timelines.
+"""
+import heapq
+import itertools
+
+from django.conf import settings
+from django.db.models import F, Max, Q, Subquery
+
+from .models import Follow, Post, TimelineEntry, UserStats
+from .paginators import MergedCursorPaginator, get_page
+from .stats import stats_for
+
+
+def is_prolific(author_id):
+    return stats_for(author_id).followers > settings.TIMELINE_FANOUT_LIMIT
+
+
+def trim(user_id, slack=0):
+    """
+    Обрезает ленту до TIMELINE_MAX_LENGTH записей.
+
+    Лента трогается, только если она длиннее предела больше чем на slack
+    записей. Граница ищется одним запросом по индексу (user, -pub_date),
+    старые записи удаляются по ней.
+    """
+    limit = settings.TIMELINE_MAX_LENGTH
+    entries = TimelineEntry.objects.filter(user_id=user_id).order_by(
+        '-pub_date', '-id').values_list('pub_date', 'id')
+    if slack and not entries[limit + slack:limit + slack + 1]:
+        return
+    cutoff = entries[limit:limit + 1]
+    if not cutoff:
+        return
+    pub_date, entry_id = cutoff[0]
+    TimelineEntry.objects.filter(user_id=user_id).filter(
+        Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lte=entry_id)
+    ).delete()
+
+
+def fan_out(post):
+    if is_prolific(post.author_id):
+        return
+    follower_ids = list(
+        Follow.objects.filter(
+            author_id=post.author_id, user__isnull=False
+        ).values_list('user_id', flat=True)
+    )
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in follower_ids
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    if is_prolific(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('pk', 'pub_date')[:settings.TIMELINE_MAX_LENGTH]
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts
+        ],
+        ignore_conflicts=True,
+    )
+    trim(user_id, settings.TIMELINE_TRIM_SLACK)
+
+
+def prune(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def rebuild(user_id):
+    """
+    Строит ленту читателя заново по его подпискам.
+
+    Для массовой загрузки: вместо backfill и trim на каждую подписку
+    берутся последние публикации каждого автора по индексу
+    (author, -pub_date) и сливаются в памяти. Популярные авторы
+    определяются по UserStats, поэтому статистика должна быть
+    пересчитана заранее.
+    """
+    authors = Follow.objects.filter(
+        user_id=user_id,
+        author__stats__followers__lte=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True)
+    newest = heapq.nlargest(
+        settings.TIMELINE_MAX_LENGTH,
+        itertools.chain.from_iterable(
+            Post.objects.filter(author_id=author_id).order_by(
+                '-pub_date', '-id'
+            ).values_list('pub_date', 'pk')[:settings.TIMELINE_MAX_LENGTH]
+            for author_id in authors
+        ),
+    )
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    TimelineEntry.objects.bulk_create([
+        TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for pub_date, pk in newest
+    ])
+
+
+def _prolific(user):
+    authors = Follow.objects.filter(user=user).values('author_id')
+    return UserStats.objects.filter(
+        user_id__in=Subquery(authors),
+        followers__gt=settings.TIMELINE_FANOUT_LIMIT,
+    )
+
+
+def prolific_followed(user):
+    """Популярные авторы из подписок пользователя."""
+    return list(_prolific(user).values_list('user_id', flat=True))
+
+
+def prolific_newest(user):
+    """
+    Ключ последней публикации популярных авторов из подписок.
+
+    Их публикации не попадают в TimelineEntry, поэтому версия ленты
+    по одной таблице лент их не замечает.
+    """
+    return Post.objects.filter(
+        author_id__in=Subquery(_prolific(user).values('user_id'))
+    ).aggregate(last=Max('pk'))['last']
+
+
+def timeline_posts(user):
+    """Публикации ленты подписок пользователя."""
+    prolific = prolific_followed(user)
+    if not prolific:
+        return Post.objects.filter(timeline_entries__user=user)
+    entries = TimelineEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(
+        Q(pk__in=Subquery(entries)) | Q(author_id__in=prolific)
+    )
+
+
+def timeline_sources(user, prolific):
+    """
+    Источники ленты с популярными авторами для MergedCursorPaginator.
+
+    Записи ленты читаются по индексу (user, -pub_date), публикации
+    каждого популярного автора — по индексу (author, -pub_date).
+    """
+    entries = Post.objects.for_feed().filter(
+        timeline_entries__user=user
+    ).annotate(feed_date=F('timeline_entries__pub_date'))
+    return [entries] + [
+        Post.objects.for_feed().filter(author_id=author_id).annotate(
+            feed_date=F('pub_date'))
+        for author_id in prolific
+    ]
+
+
+def timeline_page(request, user, per_page):
+    """
+    Страница ленты подписок.
+
+    Без популярных авторов страница выбирается одним проходом по индексу
+    (user, -pub_date) ленты, публикации догружаются по первичному ключу.
+    """
+    prolific = prolific_followed(user)
+    if prolific:
+        return MergedCursorPaginator(
+            timeline_sources(user, prolific), per_page, 'feed_date'
+        ).get_page(request.GET.get('cursor'))
+    page = get_page(request, user.timeline.all(), per_page)
+    posts = Post.objects.for_feed().in_bulk(
+        [entry.post_id for entry in page])
+    page.object_list = [posts[entry.post_id] for entry in page]
+    return page
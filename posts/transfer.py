@@ -0,0 +1,82 @@
+"""
+Перенос данных между окружениями в формате NDJSON.
+
+Каждая строка файла — одна запись {"model": ..., "pk": ..., "fields": ...}.
+Модели идут в порядке зависимостей: пользователи, группы, публикации,
+комментарии, подписки. Выгрузка читает таблицы через iterator(), загрузка
+пишет пачками bulk_create, так что память не растёт с размером файла.
+
+Пользователи и группы при загрузке сопоставляются по username и slug,
+остальные записи получают pk исходной базы со сдвигом на максимальный
+pk целевой таблицы. Сдвиги сохраняются в файле состояния вместе
+с номером последней записанной строки, поэтому прерванную загрузку
+можно продолжить тем же вызовом.
+"""
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Follow, Group, Post, User
+
+EXPORTS = (
+    ('user', User, (
+        'username', 'first_name', 'last_name', 'email', 'password',
+        'is_active', 'date_joined',
+    )),
+    ('group', Group, ('title', 'description', 'slug')),
+    ('post', Post, (
+        'text', 'pub_date', 'author_id', 'group_id', 'image',
+        'comment_count',
+    )),
+    ('comment', Comment, ('post_id', 'author_id', 'text', 'created')),
+    ('follow', Follow, ('user_id', 'author_id')),
+)
+MODELS = {label: model for label, model, _ in EXPORTS}
+# Записи этих моделей получают pk со сдвигом, остальные — по ключу.
+OFFSET_MODELS = ('post', 'comment', 'follow')
+
+
+class Encoder(DjangoJSONEncoder):
+    """Даты с микросекундами: DjangoJSONEncoder округляет до миллисекунд."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def export_lines(chunk_size):
+    for label, model, fields in EXPORTS:
+        rows = model.objects.order_by('pk').values_list('pk', *fields)
+        if model is Follow:
+            rows = rows.filter(user__isnull=False, author__isnull=False)
+        for pk, *values in rows.iterator(chunk_size=chunk_size):
+            record = {
+                'model': label, 'pk': pk, 'fields': dict(zip(fields, values)),
+            }
+            yield json.dumps(record, cls=Encoder, ensure_ascii=False) + '\n'
+
+
+def create_with_dates(model, objects, **options):
+    """
+    bulk_create, сохраняющий исходные даты полей auto_now_add.
+
+    При вставке auto_now_add подставляет текущее время, поэтому даты
+    записываются следом одним bulk_update по первичным ключам. Объектам
+    нужны явные pk; вызывается внутри транзакции.
+    """
+    fields = [
+        field.attname for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    dates = [
+        [getattr(obj, field) for field in fields] for obj in objects
+    ]
+    model.objects.bulk_create(objects, **options)
+    if not fields:
+        return
+    for obj, values in zip(objects, dates):
+        for field, value in zip(fields, values):
+            setattr(obj, field, value)
+    model.objects.bulk_update(objects, fields)
@@ -0,0 +1,64 @@
+"""
+Ограничение загружаемых файлов.
+
+LimitedUploadHandler стоит первым в FILE_UPLOAD_HANDLERS: он считает
+байты каждого файла и, как только файл превышает MAX_UPLOAD_SIZE,
+прерывает разбор запроса через StopUpload(connection_reset=True).
+Остаток тела запроса не читается, поля после файла теряются. Вместо
+файла request_files подставляет пустую отметку OversizedUpload, и форма
+сообщает об ошибке.
+"""
+import logging
+import resource
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+logger = logging.getLogger(__name__)
+
+
+class OversizedUpload(SimpleUploadedFile):
+    def __init__(self, name, received):
+        super().__init__(name, b'')
+        self.received = received
+
+
+def peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.rss_before = peak_rss_kb()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.MAX_UPLOAD_SIZE:
+            logger.info(
+                'Загрузка %s прервана после %d байт',
+                self.file_name, self.received)
+            self.request.oversized_uploads = {
+                self.field_name: OversizedUpload(
+                    self.file_name, self.received),
+            }
+            raise StopUpload(connection_reset=True)
+        return raw_data
+
+    def file_complete(self, file_size):
+        logger.info(
+            'Загрузка %s: %d байт, рост пикового RSS %d КБ',
+            self.file_name, self.received, peak_rss_kb() - self.rss_before)
+        return None
+
+
+def request_files(request):
+    """request.FILES вместе с отметками прерванных загрузок."""
+    oversized = getattr(request, 'oversized_uploads', None)
+    if not oversized:
+        return request.FILES
+    files = request.FILES.copy()
+    files.update(oversized)
+    return files
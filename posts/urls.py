@@ -20,6 +20,11 @@ urlpatterns = [
         views.group_posts,
         name='group_posts'
     ),
+    path(
+        'search/',
+        views.search,
+        name='search'
+    ),
     path(
         'follow/',
         views.follow_index,
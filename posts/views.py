@@ -1,49 +1,109 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.paginator import EmptyPage
+from django.db import IntegrityError, transaction
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from yatube.settings import PER_PAGE
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.http import require_POST
+from yatube.settings import FEED_CACHE_TIMEOUT, PER_PAGE, SEARCH_MAX_PAGES
 
+from .etags import not_modified, page_etag, with_etag
+from .feed_cache import feed_generation
 from .forms import CommentForm, PostForm
+from .fragments import attach_fragments
 from .models import Follow, Group, Post, User
+from .paginators import RankedPaginator, get_page
+from .search import search_posts
+from .stats import stats_for
+from .thumbnails import queue_thumbnails
+from .timeline import timeline_page
+from .uploads import request_files
+
+
+def lazy_page(request, posts):
+    """
+    Страница ленты с фрагментами, которая читается при первом обращении.
+
+    Если шаблон отдаёт ленту из {% cache %}, к странице он не обращается,
+    и запросы ленты и фрагментов не выполняются.
+    """
+    def load():
+        page = get_page(request, posts, PER_PAGE)
+        attach_fragments(page)
+        return page
+    return SimpleLazyObject(load)
 
 
 def index(request):
-    latest = Post.objects.all()
-    paginator = Paginator(latest, PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'index.html', {'page': page})
+    etag = page_etag(request)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    return with_etag(render(request, 'index.html', {
+        'page': lazy_page(request, Post.objects.for_feed()),
+        'feed_generation': feed_generation(),
+        'feed_cache_timeout': FEED_CACHE_TIMEOUT,
+    }), etag)
 
 
 def group_posts(request, slug):
+    etag = page_etag(request)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'group.html', {'group': group, 'page': page})
+    posts = group.posts.for_feed()
+    page = get_page(request, posts, PER_PAGE)
+    attach_fragments(page)
+    return with_etag(render(request, 'group.html', {
+        'group': group,
+        'page': page,
+    }), etag)
 
 
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
+    stats = stats_for(author.pk)
     following = (
         request.user.is_authenticated and Follow.objects.filter(
             user=request.user, author=author).exists()
     )
-    paginator = Paginator(posts, PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'profile.html', {
+    # Карточка автора показывает имя, которое меняется без смены
+    # поколения лент.
+    etag = page_etag(
+        request, author.username, author.get_full_name(), stats.followers,
+        stats.following, stats.posts, following,
+        request.META.get('CSRF_COOKIE'))
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    posts = author.posts.for_feed()
+    page = get_page(request, posts, PER_PAGE)
+    attach_fragments(page)
+    return with_etag(render(request, 'profile.html', {
         'author': author,
+        'stats': stats,
         'page': page,
         'following': following,
-    })
+    }), etag)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = RankedPaginator(
+        lambda offset, limit: search_posts(query, offset, limit), PER_PAGE,
+        SEARCH_MAX_PAGES)
+    try:
+        page = paginator.get_page(request.GET.get('page'))
+    except EmptyPage:
+        raise Http404
+    attach_fragments(page)
+    return render(request, 'search.html', {'page': page, 'query': query})
 
 
 @login_required
 def new_post(request):
-    form = PostForm(request.POST or None, files=request.FILES or None)
+    form = PostForm(request.POST or None, files=request_files(request) or None)
     if not form.is_valid():
         return render(request, 'new.html', {
             'form': form,
@@ -52,24 +112,37 @@ def new_post(request):
     new_post = form.save(commit=False)
     new_post.author = request.user
     new_post.save()
+    if new_post.image:
+        queue_thumbnails(new_post.image.name)
     return redirect('index')
 
 
 def post_view(request, username, post_id):
     post = get_object_or_404(
-        Post,
+        Post.objects.select_related('author', 'group'),
         id=post_id,
         author__username=username
     )
-    comments = post.comments.all()
+    stats = stats_for(post.author_id)
+    # Формы страницы несут CSRF-токен из cookie читателя, карточка
+    # автора — его имя.
+    etag = page_etag(
+        request, post.author.username, post.author.get_full_name(),
+        stats.followers, stats.following, stats.posts,
+        request.META.get('CSRF_COOKIE'))
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    comments = post.comments.select_related('author')
     form = CommentForm(request.POST or None)
     if not form.is_valid():
-        return render(request, 'post.html', {
-            'post': post,
+        return with_etag(render(request, 'post.html', {
+            'post': attach_fragments([post])[0],
             'author': post.author,
+            'stats': stats,
             'comments': comments,
             'form': form
-        })
+        }), etag)
     new_comment = form.save(commit=False)
     new_comment.author = request.user
     new_comment.post = post
@@ -88,7 +161,7 @@ def post_edit(request, username, post_id):
     )
     form = PostForm(
         request.POST or None,
-        files=request.FILES or None,
+        files=request_files(request) or None,
         instance=post
     )
     if not form.is_valid():
@@ -97,18 +170,20 @@ def post_edit(request, username, post_id):
             'exp_action': 'post_edit',
             'post': post
         })
-    form.save()
+    post = form.save()
+    if post.image:
+        queue_thumbnails(post.image.name)
     return redirect('post', username, post_id)
 
 
 @login_required
 def add_comment(request, username, post_id):
     post = get_object_or_404(
-        Post,
+        Post.objects.select_related('author', 'group'),
         id=post_id,
         author__username=username
     )
-    comments = post.comments.all()
+    comments = post.comments.select_related('author')
     form = CommentForm(request.POST or None)
     if not form.is_valid():
         return render(request, 'comments.html', {
@@ -124,36 +199,44 @@ def add_comment(request, username, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = timeline_page(request, request.user, PER_PAGE)
+    attach_fragments(page)
     return render(request, "follow.html", {'page': page})
 
 
+def follow_response(request, author, following):
+    """JSON для переключения кнопки на странице, иначе возврат в профиль."""
+    if request.is_ajax() or 'application/json' in request.META.get(
+            'HTTP_ACCEPT', ''):
+        return JsonResponse({
+            'following': following,
+            'followers': stats_for(author.pk).followers,
+        })
+    return redirect('profile', author.username)
+
+
 @login_required
+@require_POST
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(User.objects.only('username'),
+                               username=username)
     if author == request.user:
-        return redirect("profile", username)
-    Follow.objects.get_or_create(user=request.user, author=author)
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, "follow.html", {'page': page})
+        return follow_response(request, author, False)
+    try:
+        with transaction.atomic():
+            Follow.objects.create(user=request.user, author=author)
+    except IntegrityError:
+        pass
+    return follow_response(request, author, True)
 
 
 @login_required
+@require_POST
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
-    dell_follow = get_object_or_404(Follow, user=request.user, author=author)
-    dell_follow.delete()
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, "follow.html", {'page': page})
+    author = get_object_or_404(User.objects.only('username'),
+                               username=username)
+    Follow.objects.filter(user=request.user, author=author).delete()
+    return follow_response(request, author, False)
 
 
 def page_not_found(request, exception):
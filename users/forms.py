@@ -1,11 +1,25 @@
+from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import get_user_model
 
 
 User = get_user_model()
 
+# Первые части адресов сайта: профиль пользователя с таким именем
+# перекрывался бы маршрутом, объявленным раньше <str:username>/.
+RESERVED_USERNAMES = {
+    '404', '500', 'about', 'admin', 'api', 'auth', 'follow', 'group',
+    'new', 'search',
+}
+
 
 class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ("first_name", "last_name", "username", "email")
+
+    def clean_username(self):
+        username = self.cleaned_data['username']
+        if username.lower() in RESERVED_USERNAMES:
+            raise forms.ValidationError('Это имя пользователя занято.')
+        return username
@@ -0,0 +1,15 @@
+from django.test import TestCase
+
+from .forms import CreationForm
+
+
+class CreationFormTest(TestCase):
+    def test_reserved_username(self):
+        """Имя, совпадающее с адресом сайта, не регистрируется"""
+        data = {
+            'username': 'search', 'password1': 'Sl0zhnyi-parol',
+            'password2': 'Sl0zhnyi-parol',
+        }
+        self.assertIn('username', CreationForm(data).errors)
+        data['username'] = 'searcher'
+        self.assertTrue(CreationForm(data).is_valid())
@@ -0,0 +1,31 @@
+"""
+Каталог для файлов, которые сервер создаёт во время работы.
+
+Кэш SQLite хранит значения в pickle, поэтому чужой файл в этом каталоге
+означает выполнение чужого кода от имени сервера. Каталог создаётся
+с правами 0700, а уже существующий принимается, только если это
+настоящий каталог текущего пользователя без прав для группы и остальных.
+"""
+import os
+import stat
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+def private_directory(path):
+    """Создаёт или проверяет каталог path; возвращает path."""
+    try:
+        os.makedirs(path, mode=0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise ImproperlyConfigured(f'{path} не является каталогом')
+    if info.st_uid != os.getuid():
+        raise ImproperlyConfigured(
+            f'Каталог {path} принадлежит другому пользователю')
+    if info.st_mode & 0o077:
+        raise ImproperlyConfigured(
+            f'Каталог {path} доступен другим пользователям, '
+            f'нужны права 0700')
+    return path
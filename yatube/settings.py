@@ -11,11 +11,18 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 STATIC_ROOT = os.path.join(BASE_DIR, "static")
+# Файлы, которые сервер создаёт во время работы, живут вне репозитория
+# в личном каталоге пользователя сервера (права 0700, см. yatube.runtime);
+# в продакшене каталог задаётся явно через YATUBE_RUNTIME_DIR
+RUNTIME_DIR = os.environ.get(
+    'YATUBE_RUNTIME_DIR',
+    os.path.join(tempfile.gettempdir(), f'yatube-{os.getuid()}'))
 
 
 # Quick-start development settings - unsuitable for production
@@ -38,7 +45,7 @@ ALLOWED_HOSTS = [
 
 INSTALLED_APPS = [
     'users',
-    'posts',
+    'posts.apps.PostsConfig',
     'about',
     'django.contrib.admin',
     'django.contrib.auth',
@@ -50,6 +57,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'posts.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,8 +66,12 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+# Профилирование запросов включается добавлением в MIDDLEWARE
+# 'posts.profiling.ProfilingMiddleware' первым элементом,
+# журнал медленных SQL-запросов — 'posts.slow_queries.SlowQueryLogMiddleware'
 
 ROOT_URLCONF = 'yatube.urls'
+TEST_RUNNER = 'yatube.test_runner.TestRunner'
 
 TEMPLATES = [
     {
@@ -132,6 +144,18 @@ STATIC_URL = '/static/'
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Загрузки больше FILE_UPLOAD_MAX_MEMORY_SIZE пишутся на диск по частям,
+# файлы больше MAX_UPLOAD_SIZE отклоняются, не дочитываясь до конца
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.LimitedUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+MAX_IMAGE_PIXELS = 40 * 10 ** 6
+ALLOWED_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
 # Login
 
 LOGIN_URL = "/auth/login/"
@@ -144,9 +168,63 @@ EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
 PER_PAGE = 10
-
+# Наибольший размер страницы, который можно запросить через ?limit= API
+API_MAX_LIMIT = 100
+# Последняя доступная страница результатов поиска
+SEARCH_MAX_PAGES = 50
+
+# Миниатюры готовятся в фоне пулом из THUMBNAIL_WORKERS процессов;
+# 0 — готовить сразу после сохранения публикации
+THUMBNAIL_BACKEND = 'posts.thumbnails.QueuedThumbnailBackend'
+THUMBNAIL_WORKERS = 2
+
+# Время жизни кэша лент; устаревание отслеживается поколением кэша
+FEED_CACHE_TIMEOUT = 60 * 5
+# Ключ фрагмента публикации меняется вместе с её содержимым
+POST_FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+# Картинки без публикаций удаляет команда gc_post_images, если файл
+# не сохраняли заново дольше IMAGE_GC_GRACE секунд
+IMAGE_GC_GRACE = 60 * 60
+
+# Кэш в файле SQLite общий для всех воркеров на хосте;
+# тесты подменяют его кэшем в памяти, см. yatube.test_runner
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'yatube.sqlite_cache.SQLiteCache',
+        'LOCATION': os.path.join(RUNTIME_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_BYTES': 256 * 1024 * 1024,
+        },
     }
 }
+
+# Лента «Избранные авторы»: длина ленты подписчика и число подписчиков,
+# после которого публикации автора читаются из ленты без рассылки
+TIMELINE_MAX_LENGTH = 1000
+# Лента обрезается командой trim_timelines, когда она длиннее
+# TIMELINE_MAX_LENGTH больше чем на TIMELINE_TRIM_SLACK записей
+TIMELINE_TRIM_SLACK = 100
+TIMELINE_FANOUT_LIMIT = 5000
+
+# Запросы дольше PROFILING_SLOW_MS миллисекунд попадают в буфер
+# последних PROFILING_BUFFER_SIZE медленных запросов в админке
+PROFILING_SLOW_MS = 500
+PROFILING_BUFFER_SIZE = 100
+
+# Журнал медленных SQL-запросов: порог в миллисекундах, доля
+# записываемых запросов и файл NDJSON; в продакшене файл задаётся через
+# YATUBE_SLOW_QUERY_LOG и ротируется logrotate, см. posts.slow_queries
+SLOW_QUERY_MS = 100
+SLOW_QUERY_SAMPLE_RATE = 0.1
+SLOW_QUERY_LOG = os.environ.get(
+    'YATUBE_SLOW_QUERY_LOG', os.path.join(RUNTIME_DIR, 'slow_queries.ndjson'))
+
+# Метрики Prometheus включаются переменной окружения METRICS_ENABLED=1:
+# файл, общий для всех процессов сервера, число ячеек в нём и токен
+# для сборщика; без токена /metrics видят сотрудники
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED') == '1'
+METRICS_FILE = os.path.join(RUNTIME_DIR, 'metrics.mmap')
+METRICS_SLOTS = 4096
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
@@ -0,0 +1,244 @@
+"""
+Кэш в локальном файле SQLite, общий для всех процессов на хосте.
+
+Файл открывается в режиме WAL: читатели не блокируют писателя,
+а каждая запись выполняется в транзакции BEGIN IMMEDIATE, поэтому
+incr атомарен между воркерами. Общий размер значений ограничен
+OPTIONS['MAX_BYTES'], число записей — OPTIONS['MAX_ENTRIES'];
+при переполнении удаляются просроченные и давно не читавшиеся записи.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .runtime import private_directory
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_stats VALUES (1, 0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN
+    UPDATE cache_stats SET entries = entries + 1, bytes = bytes + NEW.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN
+    UPDATE cache_stats SET entries = entries - 1, bytes = bytes - OLD.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache BEGIN
+    UPDATE cache_stats SET bytes = bytes - OLD.size + NEW.size;
+END;
+'''
+
+# Время последнего чтения обновляется не чаще раза в секунду,
+# чтобы чтения почти не превращались в записи.
+ACCESS_RESOLUTION = 1.0
+# Ограничение SQLite на число параметров в одном запросе.
+MAX_VARIABLES = 500
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_bytes = int(options.get('MAX_BYTES', 64 * 1024 * 1024))
+        self._local = threading.local()
+
+    @property
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                # Значения читаются через pickle: чужой файл в каталоге
+                # кэша — чужой код в процессе сервера.
+                private_directory(directory)
+            connection = sqlite3.connect(
+                self._path, timeout=30, isolation_level=None,
+                check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            # INSERT OR REPLACE должен вызывать триггер удаления старой строки
+            connection.execute('PRAGMA recursive_triggers=ON')
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @contextmanager
+    def _write(self):
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _store(self, connection, key, value, timeout, now):
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        connection.execute(
+            'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)',
+            (key, pickled, self.get_backend_timeout(timeout), now,
+             len(pickled)),
+        )
+
+    def _cull(self, connection, now):
+        entries, size = connection.execute(
+            'SELECT entries, bytes FROM cache_stats').fetchone()
+        if entries <= self._max_entries and size <= self._max_bytes:
+            return
+        connection.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        entries, size = connection.execute(
+            'SELECT entries, bytes FROM cache_stats').fetchone()
+        while entries > self._max_entries or size > self._max_bytes:
+            batch = max(entries // self._cull_frequency, 1)
+            connection.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (batch,),
+            )
+            entries, size = connection.execute(
+                'SELECT entries, bytes FROM cache_stats').fetchone()
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._get_many([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = self._get_many(list(keys))
+        return {keys[key]: value for key, value in found.items()}
+
+    def _get_many(self, keys):
+        found = {}
+        for start in range(0, len(keys), MAX_VARIABLES):
+            found.update(self._select(keys[start:start + MAX_VARIABLES]))
+        return found
+
+    def _select(self, keys):
+        if not keys:
+            return {}
+        now = time.time()
+        placeholders = ', '.join('?' * len(keys))
+        rows = self._connection.execute(
+            f'SELECT key, value, accessed FROM cache '
+            f'WHERE key IN ({placeholders}) '
+            f'AND (expires IS NULL OR expires > ?)',
+            (*keys, now),
+        ).fetchall()
+        stale = [key for key, _, accessed in rows
+                 if accessed < now - ACCESS_RESOLUTION]
+        if stale:
+            placeholders = ', '.join('?' * len(stale))
+            self._connection.execute(
+                f'UPDATE cache SET accessed = ? WHERE key IN ({placeholders})',
+                (now, *stale),
+            )
+        return {key: pickle.loads(value) for key, value, _ in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        items = [(self._key(key, version), value)
+                 for key, value in data.items()]
+        with self._write() as connection:
+            for key, value in items:
+                self._store(connection, key, value, timeout, now)
+            self._cull(connection, now)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, now))
+            if connection.execute(
+                    'SELECT 1 FROM cache WHERE key = ?', (key,)).fetchone():
+                return False
+            self._store(connection, key, value, timeout, now)
+            self._cull(connection, now)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._write() as connection:
+            updated = connection.execute(
+                'UPDATE cache SET expires = ? '
+                'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), key, time.time()),
+            ).rowcount
+        return bool(updated)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT value FROM cache '
+                'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (key, now),
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            pickled = pickle.dumps(value, self.pickle_protocol)
+            connection.execute(
+                'UPDATE cache SET value = ?, size = ?, accessed = ? '
+                'WHERE key = ?',
+                (pickled, len(pickled), now, key),
+            )
+        return value
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._connection.execute(
+            'SELECT 1 FROM cache '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        with self._write() as connection:
+            connection.executemany(
+                'DELETE FROM cache WHERE key = ?', [(key,) for key in keys])
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живёт весь поток: открытие файла дороже запроса.
+        pass
@@ -0,0 +1,33 @@
+"""
+Настройки всего тестового запуска.
+
+Кэш по умолчанию — файл SQLite, общий с сервером разработки:
+cache.clear() в тестах стёр бы его, а записи переживали бы запуски.
+Поэтому тесты работают с LocMemCache, а миниатюры готовят сразу,
+без пула процессов. TestRunner для manage.py test и фикстура
+в conftest.py для pytest включают эти настройки на весь запуск.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'yatube-tests',
+    }
+}
+
+
+def test_settings():
+    return override_settings(CACHES=TEST_CACHES, THUMBNAIL_WORKERS=0)
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_settings = test_settings()
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)
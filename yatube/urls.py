@@ -19,6 +19,9 @@ from django.urls import include, path
 from django.conf.urls import handler404, handler500
 from django.conf.urls.static import static
 
+from posts.admin import slow_requests_view
+from posts.metrics import metrics_view
+
 
 handler404 = "posts.views.page_not_found"  # noqa
 handler500 = "posts.views.server_error"  # noqa
@@ -27,7 +30,10 @@ urlpatterns = [
     path('about/', include('about.urls', namespace='about')),
     path("auth/", include("users.urls")),
     path("auth/", include("django.contrib.auth.urls")),
+    path('admin/slow-requests/', slow_requests_view, name='slow_requests'),
     path('admin/', admin.site.urls),
+    path('api/v1/', include('posts.api_urls', namespace='api_v1')),
+    path('metrics', metrics_view, name='metrics'),
     path("", include("posts.urls")),
 ]
 if settings.DEBUG: